@@ -0,0 +1,183 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from backoff import retry_after_seconds
+from loop_local import LoopLocal
+from metrics import registry
+from open_ai import GPTConnectionError, GPTError, GPTRateLimitError, GPTRequestError, GPTServerError, GPTTimeoutError
+from tokens import trim_to_tokens
+
+load_dotenv()
+
+# Talks to the Messages API over plain HTTP: this module's name shadows the
+# anthropic SDK package for scripts run from this directory.
+API_VERSION = "2023-06-01"
+
+
+def _claude_error(e):
+    """Translate an exception raised by requests or httpx into the GPTError the router and pipeline expect."""
+    import httpx
+    import requests
+
+    if isinstance(e, GPTError):
+        return e
+    if isinstance(e, (requests.Timeout, httpx.TimeoutException)):
+        return GPTTimeoutError(str(e))
+    if isinstance(e, (requests.ConnectionError, httpx.TransportError)):
+        return GPTConnectionError(str(e))
+    response = getattr(e, "response", None)
+    if isinstance(e, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None:
+        status = response.status_code
+        if status == 429:
+            return GPTRateLimitError(str(e), status, retry_after_seconds(response.headers.get("retry-after")))
+        # 529 (overloaded) lands here too.
+        error_class = GPTServerError if status >= 500 else GPTRequestError
+        return error_class(str(e), status)
+    return GPTError(f"{type(e).__name__}: {e}")
+
+
+class Claude:
+    def __init__(self, api_key=None, default_model="claude-3-5-haiku-latest", default_temperature=0.7, default_max_tokens=1000, base_url="https://api.anthropic.com", timeout=60.0, max_in_flight=64, max_user_tokens=None):
+        """
+        Initialize the Claude class with default parameters.
+
+        Mirrors GPT.call and GPT.acall so either can sit behind the router.
+
+        Args:
+            api_key (str): Your Anthropic API key.
+            default_model (str): Default model to use for API calls.
+            default_temperature (float): Default sampling temperature for the model.
+            default_max_tokens (int): Default maximum tokens to generate.
+            base_url (str): Anthropic API root.
+            timeout (float): Request timeout in seconds.
+            max_in_flight (int): Maximum number of acall requests awaiting a response at once, per event loop.
+            max_user_tokens (int): Trim user prompts to this many tokens before sending (optional).
+        """
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY is not set in environment variables or provided as a parameter.")
+
+        self.default_model = default_model
+        self.default_temperature = default_temperature
+        self.default_max_tokens = default_max_tokens
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_user_tokens = max_user_tokens
+        self.headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": API_VERSION,
+            "content-type": "application/json"
+        }
+        self._session = None
+        self.max_in_flight = max_in_flight
+        # Async clients and semaphores are bound to the event loop they are first used on.
+        self._async_clients = LoopLocal(self._new_async_client)
+        self._semaphores = LoopLocal(lambda: asyncio.Semaphore(self.max_in_flight))
+
+    @property
+    def session(self):
+        """Pooled requests session, created on first use."""
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
+
+    @property
+    def async_client(self):
+        """httpx.AsyncClient of the running event loop, created on first use and shared by every acall on that loop."""
+        return self._async_clients.get()
+
+    def _new_async_client(self):
+        import httpx
+
+        return httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=self.timeout)
+
+    def _request(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """Build the Messages API body. frequency_penalty is accepted for GPT compatibility and ignored."""
+        if dynamic_inputs:
+            user_prompt += "".join([f"\n{key}: {value}" for key, value in dynamic_inputs.items()])
+        if self.max_user_tokens is not None:
+            user_prompt = trim_to_tokens(user_prompt, self.max_user_tokens)
+
+        return {
+            "model": model or self.default_model,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_prompt}],
+            "temperature": temperature if temperature is not None else self.default_temperature,
+            "max_tokens": max_tokens or self.default_max_tokens,
+        }
+
+    @staticmethod
+    def _response_text(data):
+        """Extract the reply text and record token usage in the metrics registry."""
+        usage = data.get("usage") or {}
+        registry.incr("claude_calls")
+        registry.incr("claude_prompt_tokens", usage.get("input_tokens", 0))
+        registry.incr("claude_completion_tokens", usage.get("output_tokens", 0))
+        return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+
+    def call(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """
+        Call the Anthropic Messages API with dynamic and static prompts.
+
+        Args:
+            Same as GPT.call.
+
+        Returns:
+            str: The assistant's response.
+
+        Raises:
+            GPTError: If the request failed, with the same subclasses GPT.call raises.
+        """
+        request = self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty)
+        try:
+            with registry.timer("claude_call"):
+                response = self.session.post(f"{self.base_url}/v1/messages", json=request, timeout=self.timeout)
+                response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            raise _claude_error(e) from e
+        return self._response_text(data)
+
+    async def acall(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """
+        Asynchronous version of call; at most max_in_flight requests await a response at once.
+
+        Args:
+            Same as GPT.call.
+
+        Returns:
+            str: The assistant's response.
+
+        Raises:
+            Same as call.
+        """
+        request = self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty)
+        async with self._semaphores.get():
+            try:
+                with registry.timer("claude_call"):
+                    response = await self.async_client.post("/v1/messages", json=request)
+                    response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                raise _claude_error(e) from e
+        return self._response_text(data)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+    async def aclose(self):
+        """Close the running event loop's async client; the next acall on this loop opens a new one."""
+        client = self._async_clients.pop()
+        if client is not None:
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    claude = Claude()
+    print(claude.call(system_prompt="You are a helpful assistant.", user_prompt="Tell me a fun fact about space."))
@@ -0,0 +1,94 @@
+"""
+Cold-start import benchmark for the agents modules.
+
+Each module is imported in a fresh interpreter with outbound connections
+blocked. The run fails if an import touches the network, pulls in a heavy
+dependency eagerly, or takes longer than the time budget.
+
+Usage:
+    python bench_import.py
+    python bench_import.py --budget-ms 150 --repeat 9 main open_ai
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "main", "open_ai", "serper", "taxonomy", "metrics", "disk_cache",
+    "rate_limit", "singleflight", "journal", "normalize", "backoff", "response_cache", "tokens", "anthropic", "router",
+    "circuit_breaker",
+]
+
+# Dependencies that must only be imported when first used.
+HEAVY = ["pandas", "numpy", "openai", "requests", "httpx", "streamlit", "rapidfuzz", "tiktoken"]
+
+_PROBE = """
+import json, socket, sys, time
+
+def _blocked(*args, **kwargs):
+    raise RuntimeError("network I/O attempted during import")
+
+socket.socket.connect = socket.socket.connect_ex = _blocked
+socket.create_connection = socket.getaddrinfo = _blocked
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, repeat=5):
+    """
+    Import a module in fresh interpreters and time it.
+
+    Args:
+        module: Module name, importable from this directory
+        repeat: Number of cold imports to run
+
+    Returns:
+        Dict with the median import time in ms, the heavy modules it loaded
+        and the error output of a failed import (None on success)
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    heavy = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+            cwd=here, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            return {"module": module, "median_ms": None, "heavy": [], "error": proc.stderr.strip().splitlines()[-1]}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"] * 1000)
+        heavy = result["heavy"]
+    return {"module": module, "median_ms": round(statistics.median(samples), 1), "heavy": heavy, "error": None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if importing the agents modules is slow or has side effects.")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to check (defaults to all)")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Maximum median cold import time per module")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold imports per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        result = measure(module, args.repeat)
+        if result["error"]:
+            status = f"FAIL  {result['error']}"
+        elif result["heavy"]:
+            status = f"FAIL  eagerly imports {', '.join(result['heavy'])}"
+        elif result["median_ms"] > args.budget_ms:
+            status = f"FAIL  over the {args.budget_ms:g} ms budget"
+        else:
+            status = "ok"
+        failed = failed or status != "ok"
+        median = "-" if result["median_ms"] is None else f"{result['median_ms']:.1f} ms"
+        print(f"{module:<16}{median:>10}  {status}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Optional
+
+from metrics import registry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+    def __init__(self, message: str, retry_in: float = 0.0):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, name: str = "circuit"):
+        """
+        Fail fast while a service is down instead of waiting out every timeout.
+
+        The circuit opens after failure_threshold consecutive failures. While
+        it is open, check() raises CircuitOpenError right away. Once the
+        cooldown has passed the circuit is half-open: a single probe request
+        is let through, and its outcome closes the circuit again or reopens
+        it for another cooldown. Safe to share between threads and asyncio
+        tasks.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown: Seconds the circuit stays open before a probe is allowed
+            name: Prefix of the counters in the metrics registry
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.name = name
+        self.failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def check(self) -> None:
+        """
+        Claim permission to send a request.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already in flight
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+                self._probe_started = None
+            if self._state == HALF_OPEN:
+                # A probe whose caller never reported back must not block the circuit forever.
+                if self._probe_started is None or now - self._probe_started >= self.cooldown:
+                    self._probe_started = now
+                    return
+                # The probe settles the state soon, so there is no cooldown to wait out.
+                message, retry_in = f"{self.name} circuit is half-open, waiting on the probe request", 0.0
+            elif self._state == OPEN:
+                retry_in = self._opened_at + self.cooldown - now
+                message = f"{self.name} circuit is open, retry in {retry_in:.1f}s"
+            else:
+                return
+        registry.incr(f"{self.name}_rejected")
+        raise CircuitOpenError(message, retry_in)
+
+    def success(self) -> None:
+        """Record a request that reached the service; closes the circuit."""
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"{self.name} circuit closed")
+            self._state = CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def failure(self) -> None:
+        """Record a failed request; opens the circuit past the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+                opened = True
+            else:
+                opened = False
+        if opened:
+            registry.incr(f"{self.name}_circuit_opened")
+            print(f"{self.name} circuit opened after {self.failures} consecutive failures, cooling down for {self.cooldown:g}s")
@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from metrics import registry
+
+
+class DiskCache:
+    def __init__(self, path: str, ttl: Optional[float] = 7 * 24 * 3600, max_entries: int = 100_000, name: str = "cache"):
+        """
+        Persistent key/value cache stored in a SQLite file.
+
+        Entries expire after their TTL and the least recently used entries are
+        evicted once the cache grows past max_entries. Safe to share between
+        threads.
+
+        Args:
+            path: SQLite database file (created if missing)
+            ttl: Default time to live in seconds (None for no expiry)
+            max_entries: Maximum number of entries kept on disk
+            name: Prefix of the hit/miss counters in the metrics registry
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._evict_every = max(1, max_entries // 100)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a key.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] < now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+
+        registry.incr(f"{self.name}_misses" if row is None else f"{self.name}_hits")
+        return None if row is None else row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: String value to store
+            ttl: Time to live in seconds (defaults to the cache TTL)
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, expires, now)
+            )
+            self._writes += 1
+            if self._writes % self._evict_every == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
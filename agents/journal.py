@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict
+
+
+def row_key(index: Any, address: str) -> str:
+    """
+    Build a stable key for an input row.
+
+    The key combines the row position with a hash of the address, so a journal
+    written for one version of a CSV is not silently reused for an edited one.
+
+    Args:
+        index: The row index in the input file
+        address: The address on that row
+
+    Returns:
+        Key string identifying the row
+    """
+    digest = hashlib.sha1(str(address).encode("utf-8")).hexdigest()[:12]
+    return f"{index}:{digest}"
+
+
+class Journal:
+    def __init__(self, path: str):
+        """
+        Append-only JSON-lines journal of finished rows.
+
+        Every record is flushed and fsynced as soon as it is appended, so the
+        work done before a crash survives and can be skipped on restart.
+
+        Args:
+            path: Location of the journal file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read every record already in the journal.
+
+        A torn final line left behind by a crash is ignored.
+
+        Returns:
+            Dict mapping row key to its journaled record
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["key"]] = record
+        return records
+
+    def _torn(self) -> bool:
+        """Whether the file ends in a partial line left behind by a crash."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Durably append a record to the journal.
+
+        Args:
+            record: JSON-serializable dict with at least a "key" entry
+        """
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._torn():
+                    # Start on a fresh line, or this record would be glued to the torn one.
+                    self._file.write("\n")
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,468 @@
+"""
+Load test for the categorize pipeline against local Serper and OpenAI stand-ins.
+
+Both stubs run in-process on free localhost ports with configurable latency
+distributions, error rates and periodic 429 bursts, so throughput can be
+measured without spending credits. Every run is appended to a JSON-lines
+results file and compared with the previous runs.
+
+Usage:
+    python loadtest.py --rows 5000 --concurrency 32
+    python loadtest.py --rows 20000 --mode stream --error-rate 0.02 --burst-every 20
+    python loadtest.py --rows 5000 --mode offline --batch-seconds 5
+"""
+import argparse
+import contextlib
+import email.parser
+import email.policy
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Snippets served by the Serper stub: some resolve locally, the rest need the LLM.
+SNIPPETS = [
+    "Glendo Elementary School is a public elementary school in Glendo, Wyoming.",
+    "Port of Oakland container terminal handling transpacific cargo.",
+    "Acme Logistics LLC, 1200 Industrial Pkwy. Open 24 hours.",
+    "Joe's Pizzeria serves New York style pizza by the slice.",
+    "Regional fulfillment center operated by a national retailer.",
+    "Family owned business serving the community since 1982.",
+    "Shell gas station with convenience store and car wash.",
+    "St. Mary's Hospital emergency department and outpatient clinics.",
+]
+
+# Knowledge-graph types attached to a share of the stubbed results.
+ENTITY_TYPES = ["Elementary school", "Container terminal", "Gas station", "Pizza restaurant", "Corporate office"]
+
+
+class StubBehavior:
+    def __init__(self, median_ms=300.0, sigma=0.5, error_rate=0.0, burst_every=0.0, burst_duration=0.0, outage_at=None, outage_duration=0.0):
+        """
+        Latency and failure profile of a stub endpoint.
+
+        Args:
+            median_ms: Median response latency in milliseconds
+            sigma: Log-normal shape of the latency (0 for a fixed latency)
+            error_rate: Fraction of requests answered with a 500
+            burst_every: Start a 429 burst every this many seconds (0 to disable)
+            burst_duration: Length of each 429 burst in seconds
+            outage_at: Seconds after start when every request begins failing with a 503 (None for no outage)
+            outage_duration: Length of the outage in seconds
+        """
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.outage_at = outage_at
+        self.outage_duration = outage_duration
+        self.started = time.monotonic()
+
+    def delay(self) -> float:
+        if self.sigma <= 0:
+            return self.median
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+    def fault(self):
+        if self.outage_at is not None and 0 <= time.monotonic() - self.started - self.outage_at < self.outage_duration:
+            return 503
+        if self.burst_every > 0 and (time.monotonic() - self.started) % self.burst_every < self.burst_duration:
+            return 429
+        if random.random() < self.error_rate:
+            return 500
+        return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    behavior: StubBehavior = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        time.sleep(self.behavior.delay())
+        status = self.behavior.fault()
+        if status == 429:
+            self._send(429, {"message": "Too many requests"}, {"Retry-After": "1"})
+        elif status:
+            self._send(status, {"message": "Stub server error"})
+        else:
+            self.reply(payload)
+
+    def reply(self, payload):
+        self._send(200, self.respond(payload))
+
+    def respond(self, payload):
+        raise NotImplementedError
+
+
+class SerperStub(_StubHandler):
+    @staticmethod
+    def _result(query):
+        # Seeded by the query so repeated addresses get the same response.
+        rng = random.Random(query)
+        snippet = rng.choice(SNIPPETS)
+        result = {
+            "searchParameters": {"q": query, "type": "search", "engine": "google"},
+            "organic": [{"title": query, "link": "https://example.com", "snippet": snippet, "position": 1}],
+            "credits": 1,
+        }
+        if rng.random() < 0.3:
+            result["knowledgeGraph"] = {"title": query, "type": rng.choice(ENTITY_TYPES)}
+        return result
+
+    def respond(self, payload):
+        if isinstance(payload, list):
+            return [self._result(item["q"]) for item in payload]
+        return self._result(payload["q"])
+
+
+class OpenAIStub(_StubHandler):
+    """
+    Chat completions plus the files and batches endpoints used by the Batch API.
+
+    Uploaded files and batches live on the server object. A batch completes
+    batch_seconds after it was created; its output lines are shuffled and a
+    share of error_rate requests lands in the error file instead.
+    """
+
+    batch_seconds = 2.0
+    # Streamed completions send this many tokens, one every stream_token_ms.
+    stream_tokens = 20
+    stream_token_ms = 20.0
+
+    def do_POST(self):
+        if self.path.endswith("/files"):
+            self._upload()
+        elif self.path.endswith("/batches"):
+            self._create_batch()
+        else:
+            super().do_POST()
+
+    def do_GET(self):
+        parts = self.path.rstrip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches":
+            batch = self.server.store["batches"].get(parts[-1])
+            if batch is None:
+                self._send(404, {"error": {"message": "No such batch"}})
+            else:
+                self._send(200, self._advance(batch))
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            content = self.server.store["files"].get(parts[-2])
+            if content is None:
+                self._send(404, {"error": {"message": "No such file"}})
+            else:
+                self._send(200, content, content_type="application/octet-stream")
+        else:
+            self._send(404, {"error": {"message": "Unknown path"}})
+
+    def reply(self, payload):
+        if not payload.get("stream"):
+            return super().reply(payload)
+
+        # Server-sent events over a connection closed at the end of the stream.
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": payload["model"]}
+        prompt_tokens = sum(len(message["content"]) for message in payload["messages"]) // 4
+        try:
+            for i in range(self.stream_tokens):
+                delta = {"role": "assistant", "content": ""} if i == 0 else {"content": f"token{i} "}
+                event = {**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.stream_token_ms / 1000)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": self.stream_tokens, "total_tokens": prompt_tokens + self.stream_tokens}
+            events = [
+                {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+                {**chunk, "choices": [], "usage": usage},
+            ]
+            for event in events:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.server.store["streams_completed"] = self.server.store.get("streams_completed", 0) + 1
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early.
+            self.server.store["streams_cancelled"] = self.server.store.get("streams_cancelled", 0) + 1
+
+    def _store_file(self, content):
+        files = self.server.store["files"]
+        file_id = f"file-{len(files) + 1}"
+        files[file_id] = content
+        return file_id
+
+    def _upload(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        message = email.parser.BytesParser(policy=email.policy.default).parsebytes(header + body)
+        content = next(part.get_content() for part in message.iter_parts() if part.get_param("name", header="content-disposition") == "file")
+        content = content if isinstance(content, bytes) else content.encode("utf-8")
+        file_id = self._store_file(content)
+        self._send(200, {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": "batch.jsonl", "purpose": "batch", "status": "processed",
+        })
+
+    def _create_batch(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        batches = self.server.store["batches"]
+        lines = self.server.store["files"][payload["input_file_id"]].decode("utf-8").splitlines()
+        batch = {
+            "id": f"batch-{len(batches) + 1}", "object": "batch", "endpoint": payload["endpoint"],
+            "input_file_id": payload["input_file_id"], "completion_window": payload["completion_window"],
+            "status": "in_progress", "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "errors": None, "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+        }
+        batches[batch["id"]] = batch
+        self.server.store["started"][batch["id"]] = time.monotonic()
+        self._send(200, batch)
+
+    def _advance(self, batch):
+        if batch["status"] != "in_progress" or time.monotonic() - self.server.store["started"][batch["id"]] < self.batch_seconds:
+            return batch
+        output, errors = [], []
+        for line in self.server.store["files"][batch["input_file_id"]].decode("utf-8").splitlines():
+            request = json.loads(line)
+            if random.random() < self.behavior.error_rate:
+                errors.append({"id": "req-stub", "custom_id": request["custom_id"], "response": {
+                    "status_code": 500, "request_id": "req-stub", "body": {"error": {"message": "Stub server error"}}
+                }, "error": None})
+            else:
+                output.append({"id": "req-stub", "custom_id": request["custom_id"], "response": {
+                    "status_code": 200, "request_id": "req-stub", "body": self.respond(request["body"])
+                }, "error": None})
+        random.shuffle(output)
+        batch["output_file_id"] = self._store_file("".join(json.dumps(item) + "\n" for item in output).encode("utf-8"))
+        if errors:
+            batch["error_file_id"] = self._store_file("".join(json.dumps(item) + "\n" for item in errors).encode("utf-8"))
+        batch["request_counts"].update(completed=len(output), failed=len(errors))
+        batch["status"] = "completed"
+        return batch
+
+    def respond(self, payload):
+        prompt_tokens = sum(len(message["content"]) for message in payload["messages"]) // 4
+        # Answer with one of the names listed after the system prompt's instructions.
+        listing = payload["messages"][0]["content"].split("\n\n", 1)[-1].splitlines()
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": random.choice(listing)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 2, "total_tokens": prompt_tokens + 2},
+        }
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of new connections without dropping SYNs into a 1 s retransmit.
+    request_queue_size = 1024
+
+
+def start_stub(handler, behavior):
+    """
+    Serve a stub handler on a free localhost port in a background thread.
+
+    Returns:
+        Tuple of (server, base URL)
+    """
+    handler_class = type(handler.__name__, (handler,), {"behavior": behavior})
+    server = _StubServer(("127.0.0.1", 0), handler_class)
+    server.store = {"files": {}, "batches": {}, "started": {}}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def write_synthetic_csv(path, rows, dup_ratio=0.2, seed=0):
+    """Write a data.csv with an 'address' column, a dup_ratio share of it repeated."""
+    rng = random.Random(seed)
+    streets = ["Main Street", "Industrial Pkwy", "Harbor Blvd", "Elm St", "Oak Avenue"]
+    unique = max(1, int(rows * (1 - dup_ratio)))
+    addresses = [f"{100 + i} {rng.choice(streets)}, {10000 + i % 89999}" for i in range(unique)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("address\n")
+        for i in range(rows):
+            address = addresses[i] if i < unique else rng.choice(addresses)
+            f.write(f"\"{address}\"\n")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    serper_behavior = StubBehavior(args.serper_latency_ms, args.sigma, args.error_rate, args.burst_every, args.burst_duration)
+    OpenAIStub.batch_seconds = args.batch_seconds
+    openai_behavior = StubBehavior(
+        args.openai_latency_ms, args.sigma, args.error_rate, args.burst_every, args.burst_duration,
+        args.openai_outage_at, args.openai_outage_duration
+    )
+    serper_server, serper_url = start_stub(SerperStub, serper_behavior)
+    openai_server, openai_url = start_stub(OpenAIStub, openai_behavior)
+
+    # Point everything that reads the environment at the stubs before importing the pipeline.
+    os.environ["SERPER_API_KEY"] = "stub"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"{openai_url}/v1"
+
+    import pandas as pd
+    import main
+    from metrics import registry
+    from open_ai import GPT
+    from serper import SerperAgent
+
+    agent = SerperAgent("stub", base_url=serper_url, pool_size=args.concurrency, qps=args.qps)
+    gpt = GPT(api_key="stub", base_url=f"{openai_url}/v1", max_user_tokens=main.SNIPPET_MAX_TOKENS)
+    gpt.client  # Create the lazily imported OpenAI client outside the timed run.
+    if args.hedge and args.mode != "offline":
+        from router import HedgedRouter
+
+        backup_server, backup_url = start_stub(OpenAIStub, openai_behavior)
+        backup = GPT(api_key="stub", base_url=f"{backup_url}/v1", max_user_tokens=main.SNIPPET_MAX_TOKENS)
+        backup.client
+        gpt = HedgedRouter([("primary", gpt), ("backup", backup)], default_delay=args.openai_latency_ms / 1000 * 2)
+
+    matcher = main.MATCHER if args.lexical_match else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "data.csv")
+        output_path = os.path.join(tmp, "data_with_categories.csv")
+        write_synthetic_csv(input_path, args.rows, args.dup_ratio)
+
+        registry.reset()
+        start = time.perf_counter()
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w")):
+            if args.mode == "offline":
+                df = pd.read_csv(input_path)
+                results = main.categorize_offline(
+                    df["address"].tolist(),
+                    os.path.join(tmp, "batch.json"),
+                    agent=agent,
+                    gpt=gpt,
+                    search_batch_size=args.search_batch_size or 100,
+                    poll_interval=0.5,
+                    matcher=matcher
+                )
+                df["category"] = [result["category"] for result in results]
+            elif args.mode == "stream":
+                main.categorize_csv_streaming(
+                    input_path,
+                    output_path,
+                    chunksize=args.chunksize,
+                    concurrency=args.concurrency,
+                    agent=agent,
+                    gpt=gpt,
+                    search_batch_size=args.search_batch_size,
+                    max_outage=args.max_outage,
+                    matcher=matcher
+                )
+                df = pd.read_csv(output_path)
+            else:
+                df = main.categorize_dataframe(
+                    pd.read_csv(input_path),
+                    concurrency=args.concurrency,
+                    agent=agent,
+                    gpt=gpt,
+                    search_batch_size=args.search_batch_size,
+                    max_outage=args.max_outage,
+                    matcher=matcher
+                )
+        elapsed = time.perf_counter() - start
+
+    serper_server.shutdown()
+    openai_server.shutdown()
+
+    summary = registry.summary()
+    row = summary["stages"].get("row", {})
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "config": vars(args),
+        "rows": len(df),
+        "failed_rows": int(df["category"].isna().sum()),
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_second": round(len(df) / elapsed, 2) if elapsed > 0 else 0.0,
+        "row_latency_ms": {q: round(row.get(q, 0.0) * 1000, 1) for q in ("p50", "p95", "p99")},
+        "stage_p95_ms": {name: round(stage["p95"] * 1000, 1) for name, stage in summary["stages"].items()},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "counters": summary["counters"],
+    }
+
+
+def print_history(path, last=5):
+    """Print the most recent runs stored in the results file side by side."""
+    with open(path, "r", encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()][-last:]
+    print(f"{'timestamp':<26}{'commit':<10}{'rows':>8}{'rows/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>9}")
+    for run_result in runs:
+        latency = run_result["row_latency_ms"]
+        print(
+            f"{run_result['timestamp']:<26}{str(run_result['commit']):<10}{run_result['rows']:>8}"
+            f"{run_result['rows_per_second']:>10}{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+            f"{run_result['peak_rss_mb']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the categorize pipeline against local API stand-ins.")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows in the synthetic data.csv")
+    parser.add_argument("--dup-ratio", type=float, default=0.2, help="Share of rows repeating an earlier address")
+    parser.add_argument("--mode", choices=["batch", "stream", "offline"], default="batch", help="Pipeline entry point to drive (offline uses the Batch API)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Rows categorized in parallel")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Rows per chunk in stream mode")
+    parser.add_argument("--search-batch-size", type=int, default=0, help="Queries per Serper request (0 for one per address)")
+    parser.add_argument("--qps", type=float, default=None, help="Client-side Serper rate limit")
+    parser.add_argument("--serper-latency-ms", type=float, default=300.0, help="Median Serper stub latency")
+    parser.add_argument("--openai-latency-ms", type=float, default=600.0, help="Median OpenAI stub latency")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal latency shape (0 for fixed latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub requests failing with a 500")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Seconds between 429 bursts (0 to disable)")
+    parser.add_argument("--burst-duration", type=float, default=1.0, help="Length of each 429 burst in seconds")
+    parser.add_argument("--openai-outage-at", type=float, default=None, help="Seconds into the run when the OpenAI stub starts failing every request")
+    parser.add_argument("--openai-outage-duration", type=float, default=30.0, help="Length of the OpenAI stub outage in seconds")
+    parser.add_argument("--max-outage", type=float, default=0.0, help="Seconds the pipeline waits out an open circuit breaker before stopping")
+    parser.add_argument("--lexical-match", action="store_true", help="Enable the lexical snippet fast path")
+    parser.add_argument("--hedge", action="store_true", help="Route GPT calls through a HedgedRouter with a second OpenAI stub")
+    parser.add_argument("--batch-seconds", type=float, default=2.0, help="Time the stub takes to complete a Batch API job")
+    parser.add_argument("--results", default="bench_results.jsonl", help="JSON-lines file the run is appended to")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own progress output")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print_history(args.results)
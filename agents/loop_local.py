@@ -0,0 +1,42 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class LoopLocal:
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        One value per running event loop, created on first use.
+
+        asyncio clients and semaphores only work on the loop they were first
+        used on, so an object shared across asyncio.run calls, or between the
+        router's private loop and the caller's, needs one of each per loop.
+        Values of loops that have been closed are dropped.
+
+        Args:
+            factory: Builds the value for a loop; called inside that loop
+        """
+        self.factory = factory
+        self._values: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        Value for the running loop.
+
+        Raises:
+            RuntimeError: If no event loop is running
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                self._values = {other: v for other, v in self._values.items() if not other.is_closed()}
+                value = self._values[loop] = self.factory()
+            return value
+
+    def pop(self) -> Optional[Any]:
+        """Forget the running loop's value and return it, or None if it has none."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._values.pop(loop, None)
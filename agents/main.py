@@ -1,8 +1,21 @@
 from serper import SerperAgent
-from open_ai import GPT
+from open_ai import GPT, GPTQuotaError
+from anthropic import Claude
+from circuit_breaker import CircuitOpenError
+from router import HedgedRouter
+from disk_cache import DiskCache
+from journal import Journal, row_key
+from metrics import registry
+from normalize import canonical_address
+from rate_limit import BudgetExhausted
+from taxonomy import EntityTypeMapper, LexicalMatcher, build_category_prompt, canonicalize_categories, parse_categories, parse_category_name
 from dotenv import load_dotenv
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from functools import partial
+import argparse
+import json
 import os
-import pandas as pd
+import time
 load_dotenv()
 
 
@@ -1253,42 +1266,707 @@ Travel Agency
 Travel Lounge
 Truck Stop
 '''
+CATEGORY_NAMES = parse_categories(categories)
+MATCHER = LexicalMatcher(CATEGORY_NAMES)
+ENTITY_MAPPER = EntityTypeMapper(CATEGORY_NAMES)
+# Only these parts of a Serper response are decoded into the compact SearchResult.
+SEARCH_FIELDS = ("organic", "knowledge_graph", "places")
+CATEGORY_PROMPT = build_category_prompt(CATEGORY_NAMES)
+# Answers are bare category names. A token is at least one character, so the
+# longest name bounds the answer without loading a tokenizer at import time;
+# the slack covers stray whitespace or punctuation.
+ANSWER_MAX_TOKENS = max(len(name) for name in CATEGORY_NAMES) + 2
+# Longer snippets are trimmed; the category is almost always named near the start.
+SNIPPET_MAX_TOKENS = 200
+# Seconds rows wait out an open GPT circuit breaker before the run stops; 0 stops on the first rejection.
+MAX_OUTAGE = 300.0
 
-def categorize(query):
+
+def _serper_agent(pool_size=10, cache_path=None, qps=None, burst=None, credit_budget=None):
     serper_api = os.getenv("SERPER_API_KEY")
     if not serper_api:
         raise ValueError("SERPER_API_KEY environment variable is not set")
-        
-    agent = SerperAgent(serper_api)
-    results = agent.search(query)
-    # print(results)
-    snip = results["organic"][0]["snippet"]
-    print(snip)
-
-    gpt = GPT()
-    gpt_response = gpt.call(
-        system_prompt=f"%%%%CATEGORIES {categories}%%%%%, Enclosed in %%%%% and %%%%% is a list of categories. I want you to take the user input and output the best matching category from the list. For example, if the user input is 'Glendo Elementary En 3rd, 82213 Glendo', the output should be 'School'. Ensure your response is 1 word only",
-        user_prompt=snip
-    )
-    print(gpt_response)
-    return gpt_response
+    cache = DiskCache(cache_path, name="serper_cache") if cache_path else None
+    return SerperAgent(serper_api, pool_size=pool_size, cache=cache, qps=qps, burst=burst, credit_budget=credit_budget)
+
+
+def _gpt():
+    return GPT(max_user_tokens=SNIPPET_MAX_TOKENS)
+
+
+def _hedged_gpt(backup):
+    """GPT behind a HedgedRouter that hedges slow calls onto backup ("claude" or an OpenAI model name)."""
+    if backup == "claude":
+        backend = Claude(max_user_tokens=SNIPPET_MAX_TOKENS)
+    else:
+        backend = GPT(default_model=backup, max_user_tokens=SNIPPET_MAX_TOKENS)
+    return HedgedRouter([("openai", _gpt()), (backup, backend)])
+
+
+def _failed_row(error, stopped=False):
+    return {"snippet": None, "category": None, "source": None, "error": error, "stopped": stopped, "timings": {}}
+
+
+def _call_through_outage(gpt, max_outage, **kwargs):
+    """
+    gpt.call, waiting for an open circuit breaker to let requests through again.
+
+    Raises:
+        CircuitOpenError: If the circuit is still open after max_outage seconds of waiting
+    """
+    waited = 0.0
+    while True:
+        try:
+            return gpt.call(**kwargs)
+        except CircuitOpenError as e:
+            delay = max(e.retry_in, 0.1)
+            if waited + delay > max_outage:
+                raise
+            registry.observe("outage_wait", delay)
+            time.sleep(delay)
+            waited += delay
+
+
+def categorize_row(query, agent, gpt, matcher=None, results=None, entities=ENTITY_MAPPER, max_outage=MAX_OUTAGE):
+    """
+    Categorize a single address using shared SerperAgent and GPT instances.
+
+    When Serper returns a knowledge-graph or place type that maps onto the
+    taxonomy, or the snippet names exactly one category, the row is resolved
+    locally and the GPT call is skipped.
+
+    Args:
+        query: The address to categorize
+        agent: SerperAgent used for the web search
+        gpt: GPT instance used for the classification call
+        matcher: LexicalMatcher for the local fast path (None to always ask GPT)
+        results: SearchResult fetched ahead of time (searched here if None)
+        entities: EntityTypeMapper for Serper entity types (None to ignore them)
+        max_outage: Seconds to wait for GPT's circuit breaker to close before giving up
+
+    Returns:
+        Dict with the snippet, category, source ("entity", "lexical" or "llm"), error
+        (None on success) and the per-stage timings recorded in the metrics
+        registry. GPT answers are category names
+        validated against CATEGORY_NAMES; an invalid answer is retried once
+        and reported as an error if it is still invalid. LLM rows also carry
+        GPT's reply as given under "answer".
+    """
+    with registry.row(query=query) as row:
+        if results is None:
+            results = agent.search(query, fields=SEARCH_FIELDS, organic_limit=1)
+        snip = results.snippet
+        row["snippet"] = snip
+
+        with registry.timer("validation"):
+            typed = entities.match(results.knowledge_graph_type, results.place_types) if entities else None
+        if typed:
+            row.update(category=typed, source="entity")
+            return {"snippet": snip, "category": typed, "source": "entity", "error": None, "timings": row["timings"]}
+
+        if snip is None:
+            raise ValueError(f"No organic result with a snippet for {query!r}")
+
+        with registry.timer("validation"):
+            local = matcher.match(snip) if matcher else None
+        if local:
+            row.update(category=local, source="lexical")
+            return {"snippet": snip, "category": local, "source": "lexical", "error": None, "timings": row["timings"]}
+
+        gpt_response = _call_through_outage(gpt, max_outage, system_prompt=CATEGORY_PROMPT, user_prompt=snip, temperature=0, max_tokens=ANSWER_MAX_TOKENS)
+        with registry.timer("validation"):
+            category = parse_category_name(gpt_response, CATEGORY_NAMES)
+        attempts = 1
+        if category is None:
+            # The retry re-sends the whole system prompt; as an unchanged prefix it is
+            # billed at the provider's cached-input rate where prompt caching applies.
+            # The reminder goes first so that trimming a long snippet cannot cut it off.
+            attempts += 1
+            registry.incr("invalid_answers")
+            gpt_response = _call_through_outage(
+                gpt,
+                max_outage,
+                system_prompt=CATEGORY_PROMPT,
+                user_prompt=f"Reply with one category name from the list, exactly as written.\n\n{snip}",
+                temperature=0,
+                max_tokens=ANSWER_MAX_TOKENS
+            )
+            with registry.timer("validation"):
+                category = parse_category_name(gpt_response, CATEGORY_NAMES)
+
+        error = None if category else f"Invalid category answer: {gpt_response!r}"
+        row.update(category=category, source="llm", error=error)
+        return {"snippet": snip, "category": category, "source": "llm", "answer": gpt_response, "attempts": attempts, "error": error, "timings": row["timings"]}
+
+
+def categorize(query, agent=None, gpt=None):
+    agent = agent or _serper_agent()
+    gpt = gpt or _gpt()
+
+    result = categorize_row(query, agent, gpt)
+    print(result["snippet"])
+    print(result["category"])
+    return result["category"]
+
+
+def categorize_batch(queries, concurrency=8, agent=None, gpt=None, progress_every=100, on_result=None, matcher=None, dedupe=True, search_batch_size=None, entities=ENTITY_MAPPER, max_outage=MAX_OUTAGE):
+    """
+    Categorize many addresses through a bounded pool of worker threads.
+
+    A single SerperAgent and GPT instance are shared by all workers. A failing
+    row is recorded with its error instead of aborting the rest of the batch.
+    When the agent's credit budget or the OpenAI quota runs out, or GPT's
+    circuit breaker stays open for longer than max_outage, pending rows are
+    cancelled and returned with stopped=True so they can be picked up by a later run.
+    With dedupe enabled, addresses sharing a canonical key are searched and
+    classified once and the result is copied to every matching row.
+
+    Args:
+        queries: List of addresses to categorize
+        concurrency: Maximum number of rows in flight at once
+        agent: SerperAgent to reuse (created from SERPER_API_KEY if omitted)
+        gpt: GPT instance to reuse (created with defaults if omitted)
+        progress_every: Print throughput after this many finished addresses
+        on_result: Optional callback(index, result) invoked as each row finishes
+        matcher: LexicalMatcher for the local fast path (None to always ask GPT)
+        dedupe: Categorize each canonical address only once
+        search_batch_size: If set, prefetch searches with SerperAgent.search_batch
+            in groups of this size instead of one request per address. Searches
+            are fetched concurrency groups at a time, while the previous window
+            of addresses is classified
+        entities: EntityTypeMapper for the Serper entity-type fast path (None to skip it)
+        max_outage: Seconds rows wait for an open GPT circuit breaker before the run stops;
+            0 stops the run at the first rejection
+
+    Returns:
+        List of result dicts (see categorize_row) in the same order as queries
+    """
+    agent = agent or _serper_agent(pool_size=concurrency)
+    gpt = gpt or _gpt()
+
+    # Group row positions by canonical address; each group is categorized once.
+    groups = {}
+    for i, query in enumerate(queries):
+        key = canonical_address(query) if dedupe else i
+        groups.setdefault(key, []).append(i)
+    unique = list(groups.values())
+    if dedupe and queries:
+        print(f"Deduplicated {len(queries)} rows to {len(unique)} unique addresses ({1 - len(unique) / len(queries):.1%} saved)")
+
+    results = [None] * len(queries)
+    unique_results = []
+    done = 0
+    errors = 0
+    stopped = False
+    stop_reason = None
+    start = time.perf_counter()
+
+    def finish(rows, result):
+        nonlocal done, errors
+        unique_results.append(result)
+        if result["error"] is not None:
+            errors += 1
+        for i in rows:
+            results[i] = dict(result)
+            if on_result:
+                on_result(i, results[i])
+
+        done += 1
+        if done % progress_every == 0 or done == len(unique):
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed if elapsed > 0 else 0.0
+            print(f"[{done}/{len(unique)}] {rate:.2f} addresses/s, {errors} errors, {elapsed:.1f}s elapsed")
+
+    # Searches are prefetched one window at a time, so finished rows reach
+    # on_result (and the journal) long before the last search is paid for.
+    window = concurrency * search_batch_size if search_batch_size else max(1, len(unique))
+    windows = [unique[k:k + window] for k in range(0, len(unique), window)]
+    fetch = partial(agent.search_batch, batch_size=search_batch_size, fields=SEARCH_FIELDS, organic_limit=1)
+    batch_requests = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="prefetch") as fetcher:
+
+        def prefetch(part):
+            """Start the batched searches for one window; returns (group, future) pairs."""
+            if not search_batch_size:
+                return []
+            first = [queries[rows[0]] for rows in part]
+            groups = [first[k:k + search_batch_size] for k in range(0, len(first), search_batch_size)]
+            return [(group, fetcher.submit(fetch, group)) for group in groups]
+
+        searches = prefetch(windows[0]) if windows else []
+        for w, part in enumerate(windows):
+            if stopped:
+                for rows in part:
+                    finish(rows, _failed_row(f"Stopped: {stop_reason}", stopped=True))
+                continue
+
+            prefetched = {}
+            for group, search in searches:
+                try:
+                    prefetched.update(zip(group, search.result()))
+                    batch_requests += 1
+                except Exception as e:
+                    # These rows search on their own, which also surfaces an exhausted budget.
+                    print(f"Prefetch failed, searching {len(group)} addresses one by one: {e}")
+            # The next window's searches run while this one is classified.
+            searches = prefetch(windows[w + 1]) if w + 1 < len(windows) else []
+
+            futures = {
+                pool.submit(categorize_row, queries[rows[0]], agent, gpt, matcher, prefetched.get(queries[rows[0]]), entities, max_outage): rows
+                for rows in part
+            }
+            for future in as_completed(futures):
+                rows = futures[future]
+                try:
+                    result = future.result()
+                except CancelledError:
+                    result = _failed_row(f"Stopped: {stop_reason}", stopped=True)
+                except (BudgetExhausted, CircuitOpenError, GPTQuotaError) as e:
+                    if not stopped:
+                        stopped = True
+                        stop_reason = e
+                        print(f"Stopping run: {e}")
+                        for pending in futures:
+                            pending.cancel()
+                        for _, search in searches:
+                            search.cancel()
+                    result = _failed_row(f"Stopped: {e}", stopped=True)
+                except Exception as e:
+                    result = _failed_row(f"{type(e).__name__}: {e}")
+                finish(rows, result)
+
+    if batch_requests:
+        print(f"Prefetched searches in {batch_requests} batch requests")
+    typed = sum(1 for result in unique_results if result["source"] == "entity")
+    local = sum(1 for result in unique_results if result["source"] == "lexical")
+    retried = sum(1 for result in unique_results if result.get("attempts", 1) > 1)
+    if unique_results:
+        print(f"Resolved from Serper entity types: {typed}/{len(unique_results)} ({typed / len(unique_results):.1%})")
+        print(f"Resolved from snippets without GPT: {local}/{len(unique_results)} ({local / len(unique_results):.1%})")
+        print(f"Invalid GPT answers retried: {retried}")
+    if stopped:
+        left = sum(1 for result in unique_results if result.get("stopped"))
+        print(f"Stopped early: {left} addresses left for the next run")
+    return results
+
+
+def categorize_dataframe(df, concurrency=8, journal=None, agent=None, gpt=None, search_batch_size=None, max_outage=MAX_OUTAGE, matcher=None):
+    """
+    Categorize every address in a DataFrame, resuming from a journal.
+
+    Rows already present in the journal are skipped. Each newly finished row is
+    appended to the journal right away, so a failed run only has to redo the
+    rows that are missing. Failed rows are not journaled and are retried on
+    the next run.
+
+    Args:
+        df: DataFrame with an 'address' column
+        concurrency: Maximum number of rows in flight at once
+        journal: Optional Journal used for checkpointing
+        agent: SerperAgent to reuse
+        gpt: GPT instance to reuse
+        search_batch_size: Prefetch searches in groups of this size (see categorize_batch)
+        max_outage: Seconds to wait out an open GPT circuit breaker (see categorize_batch)
+        matcher: LexicalMatcher for the local fast path (None to always ask GPT)
+
+    Returns:
+        Copy of df with a 'category' column built from the journaled results,
+        canonicalized against the taxonomy, a 'category_valid' flag and the
+        answers as given in 'category_raw' (see _set_category_columns)
+    """
+    addresses = df["address"].tolist()
+    keys = [row_key(index, address) for index, address in zip(df.index, addresses)]
+    done = journal.load() if journal else {}
+
+    pending = [i for i, key in enumerate(keys) if key not in done]
+    print(f"{len(keys) - len(pending)} rows already journaled, {len(pending)} to categorize")
+    # Answers of rows that failed this run; they are not journaled but still reported.
+    answers = {}
+
+    def record(i, result):
+        row = pending[i]
+        answers[keys[row]] = _raw_answer(result)
+        if result["error"] is not None:
+            return
+        entry = {"key": keys[row], "address": addresses[row], **result}
+        done[keys[row]] = entry
+        if journal:
+            with registry.timer("write"):
+                journal.append(entry)
+
+    if pending:
+        # Rows stopped by an exhausted credit budget or an API outage are not
+        # journaled, so a re-run picks them up.
+        categorize_batch(
+            [addresses[i] for i in pending],
+            concurrency=concurrency,
+            agent=agent,
+            gpt=gpt,
+            on_result=record,
+            search_batch_size=search_batch_size,
+            max_outage=max_outage,
+            matcher=matcher
+        )
+
+    df = df.copy()
+    _set_category_columns(df, [_raw_answer(done[key]) if key in done else answers.get(key) for key in keys])
+    return df
+
+
+def _raw_answer(result):
+    """The category as the row's source gave it: GPT's reply for LLM rows, None for failed rows."""
+    return result.get("answer", result["category"])
+
+
+def _set_category_columns(df, answers):
+    """
+    Add category, category_valid and category_raw columns built from one raw answer per row.
+
+    category is the taxonomy name an answer maps onto and category_valid flags
+    the rows where it does. category_raw keeps the answer as given, so a row
+    whose answer did not map onto the taxonomy can be told apart from a row
+    that failed and has no answer at all.
+    """
+    answers = list(answers)
+    df["category"], df["category_valid"] = canonicalize_categories(answers, CATEGORY_NAMES)
+    df["category_raw"] = answers
+
+
+def _count_csv_rows(path, chunksize):
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return 0
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=chunksize))
+
+
+def categorize_csv_streaming(input_path, output_path, chunksize=1000, concurrency=8, agent=None, gpt=None, search_batch_size=None, max_outage=MAX_OUTAGE, matcher=None):
+    """
+    Categorize a CSV file chunk by chunk, appending each chunk to the output.
+
+    Only one chunk is held in memory at a time, so peak memory does not grow
+    with the size of the input. Rows already present in the output file are
+    skipped, which lets an interrupted run continue where it stopped. Rows
+    that fail are written with an empty category and category_raw; rows
+    whose answer is not in the taxonomy keep it in category_raw.
+
+    Args:
+        input_path: CSV file with an 'address' column
+        output_path: CSV file the categorized chunks are appended to
+        chunksize: Number of rows read and categorized per chunk
+        concurrency: Maximum number of rows in flight at once
+        agent: SerperAgent to reuse
+        gpt: GPT instance to reuse
+        search_batch_size: Prefetch searches in groups of this size (see categorize_batch)
+        max_outage: Seconds to wait out an open GPT circuit breaker (see categorize_batch)
+        matcher: LexicalMatcher for the local fast path (None to always ask GPT)
+
+    Returns:
+        Number of rows written during this run
+    """
+    import pandas as pd
+
+    agent = agent or _serper_agent(pool_size=concurrency)
+    gpt = gpt or _gpt()
+
+    already_written = _count_csv_rows(output_path, chunksize)
+    if already_written:
+        print(f"{already_written} rows already in {output_path}, resuming after them")
+
+    written = 0
+    # A callable keeps skipping O(1) in memory; pandas turns a list-like skiprows into a set.
+    reader = pd.read_csv(input_path, chunksize=chunksize, skiprows=lambda i: 0 < i <= already_written)
+    for chunk in reader:
+        results = categorize_batch(
+            chunk["address"].tolist(),
+            concurrency=concurrency,
+            agent=agent,
+            gpt=gpt,
+            search_batch_size=search_batch_size,
+            max_outage=max_outage,
+            matcher=matcher
+        )
+        # Only the rows before the first stopped one are written, so resuming
+        # by output row count stays correct.
+        stop_at = next((i for i, result in enumerate(results) if result.get("stopped")), None)
+        if stop_at is not None:
+            stop_reason = results[stop_at]["error"]
+            chunk = chunk.iloc[:stop_at].copy()
+            results = results[:stop_at]
+
+        _set_category_columns(chunk, [_raw_answer(result) for result in results])
+
+        header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        with registry.timer("write"):
+            chunk.to_csv(output_path, mode="a", header=header, index=False)
+        written += len(chunk)
+        print(f"Appended {written} rows to {output_path}")
+        if stop_at is not None:
+            print(f"{stop_reason}; re-run to continue from here")
+            break
+
+    return written
+
+
+
+def _plan_entry(query, results, matcher, entities):
+    """
+    Resolve one searched address without GPT where possible.
+
+    Returns:
+        A result dict, or {"prompt": snippet} for an address left to the model
+    """
+    if results is None:
+        return _failed_row(f"Search failed for {query!r}")
+    snip = results.snippet
+    category = entities.match(results.knowledge_graph_type, results.place_types) if entities else None
+    source = "entity"
+    if category is None and snip is not None and matcher:
+        category = matcher.match(snip)
+        source = "lexical"
+    if category:
+        return {"snippet": snip, "category": category, "source": source, "error": None, "timings": {}}
+    if snip is None:
+        return _failed_row(f"No organic result with a snippet for {query!r}")
+    return {"prompt": snip}
+
+
+def _search_plan(first, agent, search_batch_size, matcher, entities, journal):
+    """
+    Search the addresses missing from the plan journal and resolve what can be resolved without GPT.
+
+    Entries are journaled as each group of search_batch_size searches
+    finishes, so a crash or an exhausted credit budget only loses the group
+    in flight. Failed searches are not journaled and are searched again by
+    the next run.
+
+    Returns:
+        One entry per address: a result dict, or {"prompt": snippet} for
+        addresses left to the model
+    """
+    keys = [row_key(i, query) for i, query in enumerate(first)]
+    saved = journal.load()
+    plan = [saved.get(key) for key in keys]
+    for entry in plan:
+        if entry is not None:
+            del entry["key"]
+    missing = [i for i, entry in enumerate(plan) if entry is None]
+    if len(missing) < len(first):
+        print(f"Loaded the searches for {len(first) - len(missing)} addresses from {journal.path}")
+
+    for offset in range(0, len(missing), search_batch_size):
+        positions = missing[offset:offset + search_batch_size]
+        group = [first[i] for i in positions]
+        searches = agent.search_batch(group, batch_size=search_batch_size, fields=SEARCH_FIELDS, organic_limit=1)
+        for i, query, results in zip(positions, group, searches):
+            plan[i] = _plan_entry(query, results, matcher, entities)
+            if results is not None:
+                journal.append({"key": keys[i], **plan[i]})
+        print(f"Searched {offset + len(group)}/{len(missing)} addresses")
+    return plan
+
+
+def categorize_offline(queries, state_path, agent=None, gpt=None, search_batch_size=100, matcher=None, entities=ENTITY_MAPPER, poll_interval=30.0):
+    """
+    Categorize many addresses with the OpenAI Batch API instead of live GPT calls.
+
+    Searches run up front and rows resolved from entity types or snippets
+    never reach the model. Each group of search outcomes is journaled to
+    <state_path>.plan.jsonl as soon as it comes back, so a re-run with the
+    same input only searches the addresses that were not searched yet or
+    whose search failed, and does not depend on snippets staying the same.
+    The remaining snippets are submitted as batches tracked in state_path;
+    re-running resumes them instead of submitting new ones. Invalid answers
+    are reported as errors rather than retried.
+
+    Raises:
+        BudgetExhausted: If the credit budget runs out while searching; the
+            searches done so far are kept for the next run
+
+    Args:
+        queries: List of addresses to categorize
+        state_path: JSON file tracking the submitted batches
+        agent: SerperAgent to reuse (created from SERPER_API_KEY if omitted)
+        gpt: GPT instance to reuse (created with defaults if omitted)
+        search_batch_size: Queries per Serper request
+        matcher: LexicalMatcher for the local fast path (None to always ask GPT)
+        entities: EntityTypeMapper for the Serper entity-type fast path (None to skip it)
+        poll_interval: Seconds between batch status checks
+
+    Returns:
+        List of result dicts (see categorize_row) in the same order as queries
+    """
+    agent = agent or _serper_agent()
+    gpt = gpt or _gpt()
+
+    groups = {}
+    for i, query in enumerate(queries):
+        groups.setdefault(canonical_address(query), []).append(i)
+    unique = list(groups.values())
+    first = [queries[rows[0]] for rows in unique]
+
+    with Journal(f"{state_path}.plan.jsonl") as journal:
+        plan = _search_plan(first, agent, search_batch_size, matcher, entities, journal)
+
+    unique_results = []
+    prompts = []
+    waiting = []
+    for position, entry in enumerate(plan):
+        if "prompt" in entry:
+            unique_results.append(None)
+            prompts.append({"system_prompt": CATEGORY_PROMPT, "user_prompt": entry["prompt"], "temperature": 0, "max_tokens": ANSWER_MAX_TOKENS})
+            waiting.append(position)
+        else:
+            unique_results.append(entry)
+
+    print(f"Resolved {len(unique) - len(prompts)}/{len(unique)} addresses without GPT, batching {len(prompts)}")
+    if prompts:
+        for position, prompt, answer in zip(waiting, prompts, gpt.batch(prompts, state_path, poll_interval)):
+            category = parse_category_name(answer, CATEGORY_NAMES)
+            error = None if category else f"Invalid category answer: {answer!r}"
+            unique_results[position] = {"snippet": prompt["user_prompt"], "category": category, "source": "llm", "answer": answer, "error": error, "timings": {}}
+
+    results = [None] * len(queries)
+    for rows, result in zip(unique, unique_results):
+        for i in rows:
+            results[i] = dict(result)
+    return results
+
+
+def evaluate_lexical_matcher(queries, matcher=MATCHER, agent=None, gpt=None, concurrency=8):
+    """
+    Measure the lexical fast path against GPT labels on a sample of addresses.
+
+    Every address is classified by GPT, then the matcher is run on the same
+    snippet. Precision is the share of the matcher's answers that agree with
+    GPT; coverage is the share of snippets it answers at all.
+
+    Args:
+        queries: Sample of addresses
+        matcher: LexicalMatcher to evaluate
+        agent: SerperAgent to reuse
+        gpt: GPT instance to reuse
+        concurrency: Maximum number of rows in flight at once
+
+    Returns:
+        Dict with the sample size, answered and agreeing counts, precision and coverage
+    """
+    results = categorize_batch(queries, concurrency=concurrency, agent=agent, gpt=gpt, entities=None)
+    labeled = [result for result in results if result["category"] is not None]
+    answered = agreed = 0
+    for result in labeled:
+        local = matcher.match(result["snippet"])
+        if local:
+            answered += 1
+            agreed += local == result["category"]
+            if local != result["category"]:
+                print(f"Disagreement: lexical {local!r}, GPT {result['category']!r}: {result['snippet']!r}")
+
+    report = {
+        "sample": len(labeled),
+        "answered": answered,
+        "agreed": agreed,
+        "precision": agreed / answered if answered else None,
+        "coverage": answered / len(labeled) if labeled else None,
+    }
+    print(f"Lexical matcher on {len(labeled)} GPT-labeled snippets: answered {answered}, agreed {agreed}")
+    if answered:
+        print(f"Precision {report['precision']:.1%}, coverage {report['coverage']:.1%}")
+    return report
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Categorize the addresses in a CSV file.")
+    parser.add_argument("--input", default="data.csv", help="CSV file with an 'address' column")
+    parser.add_argument("--output", default="data_with_categories.csv", help="Where to write the categorized CSV")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of rows categorized in parallel")
+    parser.add_argument("--journal", default=None, help="Checkpoint journal (defaults to <output>.journal.jsonl)")
+    parser.add_argument("--stream", action="store_true", help="Read, categorize and append the input chunk by chunk")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--search-batch-size", type=int, default=100, help="Queries per Serper request (0 for one request per address)")
+    parser.add_argument("--metrics-log", default=None, help="Per-row JSON-lines metrics (defaults to <output>.metrics.jsonl)")
+    parser.add_argument("--prometheus", default=None, help="Write a Prometheus text dump of the run metrics to this file")
+    parser.add_argument("--search-cache", default=None, help="SQLite file caching Serper results across runs")
+    parser.add_argument("--qps", type=float, default=None, help="Maximum Serper requests per second")
+    parser.add_argument("--burst", type=float, default=None, help="Serper requests allowed at once before --qps pacing")
+    parser.add_argument("--credit-budget", type=float, default=None, help="Stop cleanly after spending this many Serper credits")
+    parser.add_argument("--hedge", default=None, help="Hedge slow GPT calls onto this backup: 'claude' or an OpenAI model name")
+    parser.add_argument("--max-outage", type=float, default=MAX_OUTAGE, help="Seconds to wait out an OpenAI outage before stopping the run")
+    parser.add_argument("--lexical-match", action="store_true", help="Resolve snippets naming one category locally, without GPT")
+    parser.add_argument("--evaluate-lexical", type=int, default=None, metavar="N", help="Report the lexical matcher's precision against GPT on N sampled rows and exit")
+    parser.add_argument("--openai-batch", action="store_true", help="Classify through the OpenAI Batch API (state in <output>.batch.json)")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    agent = _serper_agent(
+        pool_size=args.concurrency,
+        cache_path=args.search_cache,
+        qps=args.qps,
+        burst=args.burst,
+        credit_budget=args.credit_budget
+    )
+
+    gpt = _hedged_gpt(args.hedge) if args.hedge and not args.openai_batch else _gpt()
+
+    matcher = MATCHER if args.lexical_match else None
+
+    if args.evaluate_lexical:
+        sample = pd.read_csv(args.input)["address"]
+        sample = sample.sample(min(args.evaluate_lexical, len(sample)), random_state=0)
+        evaluate_lexical_matcher(sample.tolist(), agent=agent, gpt=gpt, concurrency=args.concurrency)
+        raise SystemExit(0)
+
+    registry.open_row_log(args.metrics_log or f"{args.output}.metrics.jsonl")
+
+    if args.openai_batch:
+        categories_df = pd.read_csv(args.input)
+        # Batch jobs are asynchronous by design, so there is nothing to hedge.
+        results = categorize_offline(
+            categories_df["address"].tolist(),
+            f"{args.output}.batch.json",
+            agent=agent,
+            search_batch_size=args.search_batch_size or 100,
+            matcher=matcher
+        )
+        _set_category_columns(categories_df, [_raw_answer(result) for result in results])
+        with registry.timer("write"):
+            categories_df.to_csv(args.output, index=False)
+    elif args.stream:
+        categorize_csv_streaming(
+            args.input,
+            args.output,
+            chunksize=args.chunksize,
+            concurrency=args.concurrency,
+            agent=agent,
+            gpt=gpt,
+            search_batch_size=args.search_batch_size,
+            max_outage=args.max_outage,
+            matcher=matcher
+        )
+    else:
+        categories_df = pd.read_csv(args.input)
+        print(categories_df)
+
+        with Journal(args.journal or f"{args.output}.journal.jsonl") as journal:
+            categories_df = categorize_dataframe(
+                categories_df,
+                concurrency=args.concurrency,
+                journal=journal,
+                agent=agent,
+                gpt=gpt,
+                search_batch_size=args.search_batch_size,
+                max_outage=args.max_outage,
+                matcher=matcher
+            )
+        with registry.timer("write"):
+            categories_df.to_csv(args.output, index=False)
+
+    registry.close_row_log()
+    registry.print_summary()
+    if args.prometheus:
+        with open(args.prometheus, "w") as f:
+            f.write(registry.to_prometheus())
 
-    
-    categories_df = pd.read_csv("data.csv")
-    # print(os.getcwd())
-    print(categories_df)
-    categories_list = []
-    for index, row in categories_df.iterrows():
-        # print(row["address"])
-        categories_list.append(categorize(row["address"]))
-    print(categories_list)
-    categories_df["category"] = categories_list
-    categories_df.to_csv("data_with_categories.csv", index=False)
-    # print(len(categories_list))
-    # print(len(categories_df))
-
-
-    # categorize("Glendo Elementary En 3rd, 82213 Glendo")
\ No newline at end of file
+    # categorize("Glendo Elementary En 3rd, 82213 Glendo")
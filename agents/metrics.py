@@ -0,0 +1,234 @@
+import contextvars
+import json
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+_current_row = contextvars.ContextVar("metrics_row", default=None)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values: Samples (need not be sorted)
+        q: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # q * n is exact for integer inputs, so the ceiling does not pick up float noise.
+    rank = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100) - 1))
+    return ordered[rank]
+
+
+class _Stage:
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples: List[float] = []
+
+
+class Metrics:
+    def __init__(self, max_samples: int = 100_000):
+        """
+        Registry of per-stage latencies and counters for a pipeline run.
+
+        Timings and counters recorded while a row() context is active are also
+        attached to that row, so stages measured deep inside SerperAgent or GPT
+        end up in the row's JSON-lines record. The context is tracked with a
+        contextvar and therefore works across worker threads and asyncio tasks.
+
+        Args:
+            max_samples: Latency samples kept per stage for percentiles
+                (reservoir sampled beyond that, so memory stays flat)
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._row_log = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: Dict[str, _Stage] = {}
+            self.counters: Dict[str, float] = {}
+            self.rows = 0
+            self.started = time.perf_counter()
+
+    def open_row_log(self, path: str) -> None:
+        """
+        Append one JSON line per finished row to path.
+
+        Args:
+            path: JSON-lines file to append to
+        """
+        with self._lock:
+            self._row_log = open(path, "a", encoding="utf-8")
+
+    def close_row_log(self) -> None:
+        with self._lock:
+            if self._row_log is not None:
+                self._row_log.close()
+                self._row_log = None
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record one latency sample for a stage.
+
+        Args:
+            stage: Stage name such as "serper_request" or "llm_call"
+            seconds: Elapsed time in seconds
+        """
+        with self._lock:
+            data = self.stages.get(stage)
+            if data is None:
+                data = self.stages[stage] = _Stage()
+            data.count += 1
+            data.total += seconds
+            if len(data.samples) < self.max_samples:
+                data.samples.append(seconds)
+            else:
+                slot = random.randrange(data.count)
+                if slot < self.max_samples:
+                    data.samples[slot] = seconds
+
+        row = _current_row.get()
+        if row is not None:
+            row["timings"][stage] = row["timings"].get(stage, 0.0) + seconds
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """
+        Increase a counter, both globally and on the current row.
+
+        Args:
+            name: Counter name such as "llm_tokens"
+            value: Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+        row = _current_row.get()
+        if row is not None:
+            row["counters"][name] = row["counters"].get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the enclosed block as one sample of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def row(self, **fields: Any):
+        """
+        Collect the timings and counters of one pipeline row.
+
+        The yielded dict can be updated with extra fields. It is written to
+        the row log, if one is open, when the block exits.
+
+        Args:
+            **fields: Initial fields of the row record (e.g. query)
+        """
+        record = {**fields, "timings": {}, "counters": {}}
+        token = _current_row.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_row.reset(token)
+            record["total"] = time.perf_counter() - start
+            self.observe("row", record["total"])
+            with self._lock:
+                self.rows += 1
+                if self._row_log is not None:
+                    self._row_log.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    self._row_log.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the run so far.
+
+        Returns:
+            Dict with per-stage count/mean/p50/p95/p99 (seconds), counters,
+            rows, rows per second and tokens per row
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            stages = {}
+            for name, data in self.stages.items():
+                stages[name] = {
+                    "count": data.count,
+                    "mean": data.total / data.count if data.count else 0.0,
+                    "p50": percentile(data.samples, 50),
+                    "p95": percentile(data.samples, 95),
+                    "p99": percentile(data.samples, 99),
+                }
+            return {
+                "rows": self.rows,
+                "elapsed": elapsed,
+                "rows_per_second": self.rows / elapsed if elapsed > 0 else 0.0,
+                "tokens_per_row": self.counters.get("llm_tokens", 0) / self.rows if self.rows else 0.0,
+                "stages": stages,
+                "counters": dict(self.counters),
+            }
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        print(f"Rows: {summary['rows']} in {summary['elapsed']:.1f}s ({summary['rows_per_second']:.2f} rows/s)")
+        print(f"Tokens per row: {summary['tokens_per_row']:.1f}")
+        for name, stage in summary["stages"].items():
+            print(
+                f"  {name:<16} n={stage['count']:<7} p50={stage['p50'] * 1000:8.1f}ms "
+                f"p95={stage['p95'] * 1000:8.1f}ms p99={stage['p99'] * 1000:8.1f}ms"
+            )
+        for name, value in summary["counters"].items():
+            print(f"  {name}: {value:g}")
+
+    def to_prometheus(self, prefix: str = "categorize") -> str:
+        """
+        Render the registry in the Prometheus text exposition format.
+
+        Args:
+            prefix: Metric name prefix
+
+        Returns:
+            Exposition text
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, stage in summary["stages"].items():
+            for q in ("p50", "p95", "p99"):
+                quantile = int(q[1:]) / 100
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {stage[q]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["mean"] * stage["count"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+        lines += [f"# TYPE {prefix}_rows_total counter", f"{prefix}_rows_total {summary['rows']}"]
+        lines += [f"# TYPE {prefix}_rows_per_second gauge", f"{prefix}_rows_per_second {summary['rows_per_second']:.6f}"]
+        for name, value in summary["counters"].items():
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by SerperAgent, GPT and the categorize pipeline.
+registry = Metrics()
+
@@ -0,0 +1,57 @@
+import re
+import unicodedata
+
+# Long forms mapped to the USPS style abbreviations used in the canonical key.
+ABBREVIATIONS = {
+    "street": "st",
+    "str": "st",
+    "avenue": "ave",
+    "av": "ave",
+    "road": "rd",
+    "boulevard": "blvd",
+    "drive": "dr",
+    "lane": "ln",
+    "court": "ct",
+    "place": "pl",
+    "highway": "hwy",
+    "parkway": "pkwy",
+    "terrace": "ter",
+    "circle": "cir",
+    "square": "sq",
+    "suite": "ste",
+    "apartment": "apt",
+    "building": "bldg",
+    "floor": "fl",
+    "north": "n",
+    "south": "s",
+    "east": "e",
+    "west": "w",
+    "northeast": "ne",
+    "northwest": "nw",
+    "southeast": "se",
+    "southwest": "sw",
+}
+
+_ZIP_PLUS_FOUR = re.compile(r"\b(\d{5})-\d{4}\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def canonical_address(address: str) -> str:
+    """
+    Build a canonical key for an address.
+
+    Casing, accents, punctuation, whitespace, common street abbreviations and
+    ZIP+4 suffixes are normalized away, so different spellings of the same
+    facility produce the same key.
+
+    Args:
+        address: Raw address string
+
+    Returns:
+        Canonical address key
+    """
+    text = unicodedata.normalize("NFKD", str(address).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _ZIP_PLUS_FOUR.sub(r"\1", text)
+    tokens = _NON_ALNUM.sub(" ", text).split()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens)
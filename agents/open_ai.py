@@ -1,23 +1,142 @@
+import asyncio
+import contextvars
+import hashlib
+import json
 import os
-from openai import OpenAI
+import time
+from functools import lru_cache
 
 from dotenv import load_dotenv
 
+from backoff import backoff_delay, retry_after_seconds
+from circuit_breaker import CircuitBreaker
+from loop_local import LoopLocal
+from metrics import registry
+from response_cache import ResponseCache, request_key
+from tokens import count_message_tokens, trim_to_tokens
+
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Whether the last call in this context was answered from the response cache.
+_served_from_cache = contextvars.ContextVar("served_from_cache", default=False)
+
+
+class GPTError(Exception):
+    """A chat completion request that failed, after any retries."""
+
+    # Whether the failure is transient and worth retrying.
+    retryable = False
+    # Whether the failure means the API cannot serve requests; counts towards the circuit breaker.
+    outage = False
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class GPTTimeoutError(GPTError):
+    retryable = True
+    outage = True
+
+
+class GPTConnectionError(GPTError):
+    retryable = True
+    outage = True
+
+
+class GPTRateLimitError(GPTError):
+    retryable = True
+
+
+class GPTServerError(GPTError):
+    retryable = True
+    outage = True
+
+
+class GPTQuotaError(GPTError):
+    """The account is out of quota (a 429 with code insufficient_quota); no request will succeed until it is topped up."""
+
+    outage = True
+
+
+class GPTRequestError(GPTError):
+    """The API rejected the request itself (bad parameters, authentication); retrying will not help."""
+
+
+def _gpt_error(e):
+    """Translate an exception raised by the openai client into a GPTError."""
+    import openai
+
+    if isinstance(e, GPTError):
+        return e
+    if isinstance(e, openai.APITimeoutError):
+        return GPTTimeoutError(str(e))
+    if isinstance(e, openai.APIConnectionError):
+        return GPTConnectionError(str(e))
+    if isinstance(e, openai.RateLimitError) and e.code == "insufficient_quota":
+        return GPTQuotaError(str(e), e.status_code)
+    if isinstance(e, openai.RateLimitError):
+        return GPTRateLimitError(str(e), e.status_code, retry_after_seconds(e.response.headers.get("retry-after")))
+    if isinstance(e, openai.APIStatusError):
+        error_class = GPTServerError if e.status_code >= 500 else GPTRequestError
+        return error_class(str(e), e.status_code)
+    return GPTError(f"{type(e).__name__}: {e}")
+
+
+@lru_cache(maxsize=None)
+def _shared_client(api_key, base_url=None, timeout=60.0):
+    """Sync OpenAI client shared by every GPT instance with the same credentials."""
+    # Imported here: the openai package takes most of a second to import.
+    from openai import OpenAI
+
+    # GPT retries on its own, in step with the circuit breaker.
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+
+@lru_cache(maxsize=None)
+def _shared_breaker(base_url=None):
+    """Circuit breaker shared by every GPT instance talking to the same API."""
+    return CircuitBreaker(name="llm")
+
+
+@lru_cache(maxsize=None)
+def _shared_cache(path):
+    """Response cache shared by every GPT instance using the same file."""
+    return ResponseCache(path)
+
 
 class GPT:
-    def __init__(self, api_key=None, default_model="gpt-4o", default_temperature=0.7, default_max_tokens=1000, default_frequency_penalty=0.0):
+    def __init__(self, api_key=None, default_model="gpt-4o", default_temperature=0.7, default_max_tokens=1000, default_frequency_penalty=0.0, base_url=None, max_in_flight=64, cache=None, max_user_tokens=None, timeout=60.0, max_retries=3, backoff_base=0.5, backoff_cap=30.0, breaker=None, max_prompt_tokens=None):
         """
         Initialize the GPT class with default parameters.
 
+        Failed requests raise a GPTError subclass. Timeouts, connection errors,
+        429s and 5xx responses are retried with jittered exponential backoff,
+        or after the Retry-After the API asked for. All but 429s count towards
+        a circuit breaker; while it is open, calls raise CircuitOpenError at
+        once instead of waiting on a dead API. A 429 for an exhausted quota
+        raises GPTQuotaError without retrying and counts towards the breaker.
+
         Args:
             api_key (str): Your OpenAI API key.
             default_model (str): Default model to use for API calls.
             default_temperature (float): Default sampling temperature for the model.
             default_max_tokens (int): Default maximum tokens to generate.
             default_frequency_penalty (float): Default frequency penalty for the model.
+            base_url (str): OpenAI-compatible API root, e.g. a local stand-in (optional).
+            max_in_flight (int): Maximum number of acall requests awaiting a response at once, per event loop.
+            cache (ResponseCache): Cache for temperature 0 responses (optional, defaults to a
+                cache at the GPT_CACHE path if that environment variable is set).
+            max_user_tokens (int): Trim user prompts to this many tokens before sending (optional).
+            timeout (float): Request timeout in seconds.
+            max_retries (int): Retries for transient failures.
+            backoff_base (float): Delay ceiling of the first retry in seconds.
+            backoff_cap (float): Upper bound on the jittered backoff delay in seconds.
+            breaker (CircuitBreaker): Circuit breaker guarding the API (optional, defaults to
+                one shared by every GPT instance with the same base_url).
+            max_prompt_tokens (int): Refuse to send requests whose whole prompt is counted
+                over this many tokens, raising GPTRequestError instead (optional).
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -27,6 +146,124 @@ class GPT:
         self.default_temperature = default_temperature
         self.default_max_tokens = default_max_tokens
         self.default_frequency_penalty = default_frequency_penalty
+        self.max_user_tokens = max_user_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or _shared_breaker(base_url)
+        if cache is None and os.getenv("GPT_CACHE"):
+            cache = _shared_cache(os.getenv("GPT_CACHE"))
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        # Async clients and semaphores are bound to the event loop they are first used on.
+        self._async_clients = LoopLocal(self._new_async_client)
+        self._semaphores = LoopLocal(lambda: asyncio.Semaphore(self.max_in_flight))
+
+    @property
+    def served_from_cache(self):
+        """Whether the last call or acall in the current thread or task was answered from the cache."""
+        return _served_from_cache.get()
+
+    @property
+    def client(self):
+        """Sync OpenAI client, created on first use."""
+        return _shared_client(self.api_key, self.base_url, self.timeout)
+
+    @property
+    def async_client(self):
+        """AsyncOpenAI client of the running event loop, created on first use and shared by every acall on that loop."""
+        return self._async_clients.get()
+
+    def _new_async_client(self):
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+
+    def _request(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """
+        Build the chat completion arguments, filling in the instance defaults.
+
+        The prompt tokens are counted locally and added to the
+        llm_prompt_tokens_estimated counter, run-wide and on the current row.
+
+        Raises:
+            GPTRequestError: If the prompt is counted over max_prompt_tokens
+        """
+        # Populate the user prompt with dynamic inputs if provided
+        if dynamic_inputs:
+            user_prompt += "".join([f"\n{key}: {value}" for key, value in dynamic_inputs.items()])
+
+        model = model or self.default_model
+        if self.max_user_tokens is not None:
+            trimmed = trim_to_tokens(user_prompt, self.max_user_tokens, model)
+            if trimmed != user_prompt:
+                registry.incr("llm_prompts_trimmed")
+                user_prompt = trimmed
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        prompt_tokens = count_message_tokens(messages, model)
+        registry.incr("llm_prompt_tokens_estimated", prompt_tokens)
+        if self.max_prompt_tokens is not None and prompt_tokens > self.max_prompt_tokens:
+            registry.incr("llm_prompts_rejected")
+            raise GPTRequestError(f"Prompt of {prompt_tokens} tokens is over the {self.max_prompt_tokens} token limit")
+
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature if temperature is not None else self.default_temperature,
+            "max_tokens": max_tokens or self.default_max_tokens,
+            "frequency_penalty": frequency_penalty if frequency_penalty is not None else self.default_frequency_penalty,
+        }
+
+    @staticmethod
+    def _record_usage(prompt_tokens, completion_tokens):
+        """Add a call's token usage to the run totals and the current row in the metrics registry."""
+        registry.incr("llm_calls")
+        registry.incr("llm_prompt_tokens", prompt_tokens)
+        registry.incr("llm_completion_tokens", completion_tokens)
+        registry.incr("llm_tokens", prompt_tokens + completion_tokens)
+
+    def _cache_key(self, request):
+        """Key for a cacheable request, or None if caching does not apply."""
+        # Only deterministic requests are cached; sampled ones should vary between calls.
+        if self.cache is None or request["temperature"] != 0:
+            return None
+        return request_key(request)
+
+    def _response_text(self, response):
+        """Extract the assistant's reply and record the call in the metrics registry."""
+        response_text = response.choices[0].message.content
+        self._record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response_text
+
+    def _retry_delay(self, e, attempt):
+        """
+        Handle a failed attempt: return the delay before retrying it, or raise.
+
+        Raises:
+            GPTError: If the failure is not transient or the retries are used up
+        """
+        error = _gpt_error(e)
+        if error.outage:
+            self.breaker.failure()
+        elif error.status_code is not None:
+            # The API answered, so it is up even though it refused this request.
+            self.breaker.success()
+        # Anything else failed before reaching the API and says nothing about it.
+        if not error.retryable:
+            raise error from e
+        if attempt == self.max_retries:
+            raise error from e
+        registry.incr("llm_retries")
+        if error.retry_after is not None:
+            return error.retry_after
+        return backoff_delay(attempt, self.backoff_base, self.backoff_cap)
 
     def call(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
         """
@@ -43,59 +280,453 @@ class GPT:
 
         Returns:
             str: The assistant's response.
+
+        Raises:
+            GPTError: If the request failed, after retrying transient failures.
+            CircuitOpenError: If the circuit breaker is open.
+
+        With a cache configured, temperature 0 calls are answered from the
+        cache when the same model, parameters and messages were seen before.
+        """
+        request = self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty)
+
+        key = self._cache_key(request)
+        _served_from_cache.set(False)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                _served_from_cache.set(True)
+                return cached
+
+        # Call the OpenAI API
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            try:
+                with registry.timer("llm_call"):
+                    response = self.client.chat.completions.create(**request)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+            else:
+                self.breaker.success()
+                break
+
+        response_text = self._response_text(response)
+        if key is not None and response_text is not None:
+            self.cache.set(key, response_text)
+        return response_text
+
+    async def acall(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """
+        Asynchronous version of call, for fanning out many prompts from one event loop.
+
+        Requests on one event loop share an AsyncOpenAI connection pool and at
+        most max_in_flight of them await a response at once; the rest queue
+        for a slot without blocking the loop. Each loop the instance is used
+        from gets its own client, so repeated asyncio.run calls work.
+
+        Args:
+            Same as call.
+
+        Returns:
+            str: The assistant's response.
+
+        Raises:
+            Same as call.
+        """
+        request = self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty)
+
+        key = self._cache_key(request)
+        _served_from_cache.set(False)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                _served_from_cache.set(True)
+                return cached
+
+        semaphore = self._semaphores.get()
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            async with semaphore:
+                try:
+                    with registry.timer("llm_call"):
+                        response = await self.async_client.chat.completions.create(**request)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                else:
+                    self.breaker.success()
+                    break
+            # Back off without holding an in-flight slot.
+            await asyncio.sleep(delay)
+
+        response_text = self._response_text(response)
+        if key is not None and response_text is not None:
+            self.cache.set(key, response_text)
+        return response_text
+
+    def _stream_request(self, request):
+        # include_usage adds a final chunk carrying the token counts of the whole stream.
+        return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+    def _stream_chunk(self, chunk, state):
+        """Record usage and time to first token; return the chunk's text delta, if any."""
+        if chunk.usage is not None:
+            state["usage"] = chunk.usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta and state["first_token"] is None:
+            state["first_token"] = time.perf_counter() - state["start"]
+            registry.observe("llm_first_token", state["first_token"])
+        return delta
+
+    def _stream_finished(self, state, completed):
+        registry.observe("llm_call", time.perf_counter() - state["start"])
+        usage = state["usage"]
+        if usage is not None:
+            self._record_usage(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            registry.incr("llm_calls")
+        if not completed:
+            registry.incr("llm_streams_cancelled")
+
+    def stream(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
         """
+        Stream the assistant's response as it is generated.
+
+        Token usage is recorded in the metrics registry when the stream ends.
+        Closing the generator early (breaking out of the loop or calling
+        close()) closes the HTTP response, so the API stops generating tokens
+        nobody will read.
+
+        Opening the stream is retried like call(); a stream that breaks off
+        midway raises, since part of the response has already been yielded.
+
+        Args:
+            Same as call.
+
+        Yields:
+            str: Pieces of the response text as they arrive.
+
+        Raises:
+            Same as call.
+        """
+        request = self._stream_request(self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty))
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            state = {"start": time.perf_counter(), "first_token": None, "usage": None}
+            try:
+                response = self.client.chat.completions.create(**request)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+            else:
+                self.breaker.success()
+                break
+
+        completed = False
         try:
-            # Use defaults if specific values are not provided
-            model = model or self.default_model
-            temperature = temperature if temperature is not None else self.default_temperature
-            max_tokens = max_tokens or self.default_max_tokens
-            frequency_penalty = frequency_penalty if frequency_penalty is not None else self.default_frequency_penalty
-
-            # Populate the user prompt with dynamic inputs if provided
-            if dynamic_inputs:
-                user_prompt += "".join([f"\n{key}: {value}" for key, value in dynamic_inputs.items()])
-
-            # Prepare the messages for the API
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-
-            # Call the OpenAI API
-            response = client.chat.completions.create(model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            frequency_penalty=frequency_penalty)
-
-            # Extract response text
-            response_text = response.choices[0].message.content
-            tokens_used = response.usage.total_tokens
-
-            print("Response:")
-            print(response_text)
-            print(f"Tokens used: {tokens_used}")
-
-            return response_text
+            for chunk in response:
+                delta = self._stream_chunk(chunk, state)
+                if delta:
+                    yield delta
+            completed = True
+        except Exception as e:
+            raise _gpt_error(e) from e
+        finally:
+            response.close()
+            self._stream_finished(state, completed)
 
+    async def astream(self, system_prompt, user_prompt, dynamic_inputs=None, model=None, temperature=None, max_tokens=None, frequency_penalty=None):
+        """
+        Asynchronous version of stream; holds one of the max_in_flight slots while streaming.
+
+        Args:
+            Same as call.
+
+        Yields:
+            str: Pieces of the response text as they arrive.
+
+        Raises:
+            Same as call.
+        """
+        request = self._stream_request(self._request(system_prompt, user_prompt, dynamic_inputs, model, temperature, max_tokens, frequency_penalty))
+        semaphore = self._semaphores.get()
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            await semaphore.acquire()
+            state = {"start": time.perf_counter(), "first_token": None, "usage": None}
+            try:
+                response = await self.async_client.chat.completions.create(**request)
+            except BaseException as e:
+                # Back off without holding an in-flight slot, as acall does.
+                semaphore.release()
+                if not isinstance(e, Exception):
+                    raise
+                await asyncio.sleep(self._retry_delay(e, attempt))
+            else:
+                self.breaker.success()
+                break
+
+        completed = False
+        try:
+            async for chunk in response:
+                delta = self._stream_chunk(chunk, state)
+                if delta:
+                    yield delta
+            completed = True
         except Exception as e:
-            print(f"Error while calling OpenAI API: {e}")
-            return None
+            raise _gpt_error(e) from e
+        finally:
+            semaphore.release()
+            await response.close()
+            self._stream_finished(state, completed)
+
+    def batch(self, prompts, state_path, poll_interval=30.0):
+        """
+        Run many prompts through the OpenAI Batch API instead of calling them one by one.
+
+        Inputs over the per-file request or size limit are split across several batches.
+
+        Args:
+            prompts (list): One dict of call() keyword arguments per request.
+            state_path (str): File tracking the submitted batches, so an interrupted run resumes them.
+            poll_interval (float): Seconds between batch status checks.
+
+        Returns:
+            Iterator of response texts (None for failed requests) in the order of prompts.
+        """
+        return BatchJob(self, state_path, poll_interval).run(prompts)
+
+    async def aclose(self):
+        """Close the running event loop's async client; the next acall on this loop opens a new one."""
+        client = self._async_clients.pop()
+        if client is not None:
+            await client.close()
+
+
+
+class BatchJob:
+    # Statuses after which a batch will not change any more.
+    TERMINAL = {"completed", "failed", "expired", "cancelled"}
+    # Batch API limits per input file: requests, and bytes (200 MB, kept with some headroom).
+    MAX_REQUESTS = 50_000
+    MAX_BYTES = 190 * 1024 * 1024
+
+    def __init__(self, gpt, state_path, poll_interval=30.0, completion_window="24h"):
+        """
+        OpenAI Batch API job, tracked in a small JSON state file.
+
+        The requests are streamed into <state_path>.input-<k>.jsonl files, a
+        new one whenever the next request would break the per-file request or
+        size limit, and every file becomes its own batch. Each batch ID is
+        saved as soon as it is created, so a restarted run with the same
+        prompts submits only the missing batches and then picks up polling.
+        Delete the state file to submit fresh.
+
+        Args:
+            gpt (GPT): Instance whose client, defaults and metrics are used.
+            state_path (str): JSON file recording the batches.
+            poll_interval (float): Seconds between batch status checks.
+            completion_window (str): Batch completion window.
+        """
+        self.gpt = gpt
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.state = None
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+            if "batch_id" in self.state:
+                # State written before jobs were split into several batches.
+                self.state = {"count": self.state["count"], "inputs": self.state["inputs"], "batches": [
+                    {"batch_id": self.state["batch_id"], "start": 0, "count": self.state["count"], "status": self.state["status"]}
+                ]}
+
+    def _save(self):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
 
+    def _encode(self, prompts):
+        """Batch input lines, one chat completion request per prompt, keyed by position."""
+        for i, prompt in enumerate(prompts):
+            yield json.dumps({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions", "body": self.gpt._request(**prompt)})
 
+    @staticmethod
+    def _digest(lines):
+        digest = hashlib.sha256()
+        for line in lines:
+            digest.update(line.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _write_parts(self, prompts):
+        """
+        Write the batch input files, starting a new one at the per-file limits.
+
+        Yields:
+            (index, start, count, path) for each finished file.
+        """
+        index = start = count = size = 0
+        f = path = None
+        for i, line in enumerate(self._encode(prompts)):
+            data = (line + "\n").encode("utf-8")
+            if len(data) > self.MAX_BYTES:
+                raise ValueError(f"Request {i} is {len(data)} bytes, over the {self.MAX_BYTES} byte input file limit")
+            if count and (count >= self.MAX_REQUESTS or size + len(data) > self.MAX_BYTES):
+                f.close()
+                yield index, start, count, path
+                index, start, count, size, f = index + 1, i, 0, 0, None
+            if f is None:
+                path = f"{self.state_path}.input-{index}.jsonl"
+                f = open(path, "wb")
+            f.write(data)
+            count += 1
+            size += len(data)
+        if f is not None:
+            f.close()
+            yield index, start, count, path
+
+    def submit(self, prompts):
+        """
+        Write the prompts as batch JSONL, upload it and create the batches
+        that are not recorded in the state file yet.
+
+        Args:
+            prompts (list): One dict of call() keyword arguments per request.
+
+        Returns:
+            list: The batch IDs, in input order.
+        """
+        if self.state is None:
+            self.state = {"count": len(prompts), "inputs": self._digest(self._encode(prompts)), "batches": []}
+        batches = self.state["batches"]
+        for index, start, count, path in self._write_parts(prompts):
+            if index < len(batches):
+                continue
+            with open(path, "rb") as f:
+                input_file = self.gpt.client.files.create(file=f, purpose="batch")
+            batch = self.gpt.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=self.completion_window
+            )
+            batches.append({"batch_id": batch.id, "start": start, "count": count, "status": batch.status})
+            self._save()
+            print(f"Submitted batch {batch.id} with requests {start}-{start + count - 1}")
+        return [part["batch_id"] for part in batches]
+
+    def wait(self):
+        """
+        Poll the batches until every one reaches a terminal status.
+
+        Returns:
+            List of final Batch objects, in input order.
+
+        Raises:
+            RuntimeError: If a batch failed validation.
+        """
+        parts = self.state["batches"]
+        final = [None] * len(parts)
+        while True:
+            for k, part in enumerate(parts):
+                if final[k] is not None:
+                    continue
+                batch = self.gpt.client.batches.retrieve(part["batch_id"])
+                if batch.status != part["status"]:
+                    part["status"] = batch.status
+                    self._save()
+                counts = batch.request_counts
+                if counts is not None:
+                    print(f"Batch {batch.id} {batch.status}: {counts.completed}/{counts.total} done, {counts.failed} failed")
+                if batch.status in self.TERMINAL:
+                    final[k] = batch
+            if all(batch is not None for batch in final):
+                break
+            time.sleep(self.poll_interval)
+
+        for batch in final:
+            if batch.status == "failed":
+                errors = "; ".join(error.message or "" for error in (batch.errors.data or [])) if batch.errors else ""
+                raise RuntimeError(f"Batch {batch.id} failed: {errors}")
+        return final
+
+    def _lines(self, file_id):
+        if not file_id:
+            return
+        with self.gpt.client.files.with_streaming_response.content(file_id) as response:
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    def results(self, batches):
+        """
+        Stream the results of the finished batches back in input order.
+
+        Results arriving out of order are held only until the ones before
+        them have been yielded, so at most one batch's worth is buffered.
+
+        Args:
+            batches: Batch objects returned by wait().
+
+        Returns:
+            Iterator of response texts, None where a request failed.
+        """
+        for part, batch in zip(self.state["batches"], batches):
+            failed = {item["custom_id"] for item in self._lines(batch.error_file_id)}
+            pending = {}
+            position = part["start"]
+            end = part["start"] + part["count"]
+            for item in self._lines(batch.output_file_id):
+                response = item.get("response") or {}
+                body = response.get("body") or {}
+                text = None
+                if item.get("error") is None and response.get("status_code") == 200:
+                    text = body["choices"][0]["message"]["content"]
+                    self.gpt._record_usage(body["usage"]["prompt_tokens"], body["usage"]["completion_tokens"])
+                pending[int(item["custom_id"])] = text
+
+                while position in pending or str(position) in failed:
+                    yield pending.pop(position, None)
+                    position += 1
+
+            # Requests missing from both files (expired or cancelled batches).
+            while position < end:
+                yield pending.pop(position, None)
+                position += 1
+
+    def run(self, prompts):
+        """
+        Submit the prompts, or resume the batches recorded in the state file,
+        then wait for them and stream their results.
+
+        Args:
+            prompts (list): One dict of call() keyword arguments per request.
+
+        Returns:
+            Iterator of response texts (None for failed requests) in input order.
+        """
+        if self.state is not None:
+            if len(prompts) != self.state["count"] or self._digest(self._encode(prompts)) != self.state["inputs"]:
+                raise ValueError(f"{self.state_path} tracks batches for different prompts; delete it to submit new batches")
+            print(f"Resuming {len(self.state['batches'])} recorded batches")
+        self.submit(prompts)
+        return self.results(self.wait())
 
 
-# Initialize the GPT class
-gpt = GPT(api_key=os.getenv("OPENAI_API_KEY"))
-gpt_response = gpt.call(
-    system_prompt="You are a helpful assistant.",
-    user_prompt="Tell me a fun fact about space."
-)
+if __name__ == "__main__":
+    # Initialize the GPT class
+    gpt = GPT(api_key=os.getenv("OPENAI_API_KEY"))
+    gpt_response = gpt.call(
+        system_prompt="You are a helpful assistant.",
+        user_prompt="Tell me a fun fact about space."
+    )
+    print(gpt_response)
 
-# # Initialize the Gemini class
-# gemini = Gemini(api_key=os.getenv("GEMINI_API_KEY"))
-# gemini_response = gemini.call(prompt="Tell me a fun fact about space.")
+    # # Initialize the Gemini class
+    # gemini = Gemini(api_key=os.getenv("GEMINI_API_KEY"))
+    # gemini_response = gemini.call(prompt="Tell me a fun fact about space.")
 
-# # Initialize the Anthropic class
-# anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-# anthropic_response = anthropic.call(prompt="Tell me a fun fact about space.")
\ No newline at end of file
+    # # Initialize the Anthropic class
+    # anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    # anthropic_response = anthropic.call(prompt="Tell me a fun fact about space.")
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from metrics import registry
+
+
+class BudgetExhausted(Exception):
+    """Raised when a run has spent its credit budget."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Token-bucket rate limiter usable from threads and asyncio tasks.
+
+        Each caller reserves a token under a short lock and then sleeps until
+        its reservation is due, outside the lock. The same bucket can
+        therefore be shared by worker threads and by coroutines without ever
+        blocking an event loop on the lock.
+
+        Args:
+            rate: Tokens added per second (the sustained QPS)
+            burst: Bucket capacity (defaults to one second worth of tokens)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            registry.observe("rate_limit_wait", wait)
+        return wait
+
+    def acquire(self) -> None:
+        """Block the calling thread until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """Wait without blocking the event loop until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CreditBudget:
+    def __init__(self, limit: float):
+        """
+        Per-run credit budget.
+
+        Callers reserve the credits a request may cost before sending it and
+        settle the reservation with what the response reports, so requests in
+        flight can never take the spend past the limit together. It only
+        overshoots when a request costs more than was reserved for it.
+
+        Args:
+            limit: Credits the run may spend
+        """
+        self.limit = limit
+        self.spent = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.spent >= self.limit
+
+    def check(self) -> None:
+        """
+        Raises:
+            BudgetExhausted: If no credits are left
+        """
+        if self.exhausted:
+            raise BudgetExhausted(f"Credit budget of {self.limit:g} spent ({self.spent:g} used)")
+
+    def reserve(self, credits: float) -> None:
+        """
+        Set credits aside for a request about to be sent.
+
+        Raises:
+            BudgetExhausted: If the reservation would take the spend past the limit
+        """
+        with self._lock:
+            if self.spent + credits > self.limit:
+                raise BudgetExhausted(
+                    f"Credit budget of {self.limit:g} cannot cover {credits:g} more credits ({self.spent:g} used)"
+                )
+            self.spent += credits
+
+    def settle(self, reserved: float, credits: float) -> None:
+        """Replace a reservation with the credits the request actually cost (0 if it failed)."""
+        with self._lock:
+            self.spent += credits - reserved
+        if credits:
+            registry.incr("serper_credits", credits)
+
+    def spend(self, credits: float) -> None:
+        self.settle(0, credits)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from disk_cache import DiskCache
+from metrics import registry
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed key for a model request.
+
+    Args:
+        request: Model, sampling parameters and messages as sent to the API
+
+    Returns:
+        Hex digest that only changes when the request does
+    """
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = 10_000, ttl: Optional[float] = None, name: str = "memory_cache"):
+        """
+        Thread-safe in-process LRU cache with optional expiry.
+
+        Args:
+            max_entries: Entries kept before the least recently used is dropped
+            ttl: Time to live in seconds (None for no expiry)
+            name: Prefix of the hit/miss counters in the metrics registry
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        registry.incr(f"{self.name}_misses" if entry is None else f"{self.name}_hits")
+        return None if entry is None else entry[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = 30 * 24 * 3600,
+        memory_entries: int = 10_000,
+        disk_entries: int = 1_000_000,
+        name: str = "gpt_cache"
+    ):
+        """
+        Two-tier cache of model responses: an in-process LRU in front of a
+        SQLite file.
+
+        A memory miss falls through to disk, and disk hits are promoted to
+        memory. Without a path only the memory tier is used.
+
+        Args:
+            path: SQLite file for the persistent tier (None for memory only)
+            ttl: Time to live of an entry in seconds (None for no expiry)
+            memory_entries: Maximum number of responses held in memory
+            disk_entries: Maximum number of responses kept on disk
+            name: Prefix of the per-tier hit/miss counters in the metrics registry
+        """
+        self.memory = MemoryCache(memory_entries, ttl, name=f"{name}_memory")
+        self.disk = DiskCache(path, ttl, disk_entries, name=f"{name}_disk") if path else None
+
+    def get(self, key: str) -> Optional[str]:
+        """Look a key up in memory, then on disk."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value in both tiers."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups answered by either tier."""
+        lookups = self.memory.hits + self.memory.misses
+        hits = self.memory.hits + (self.disk.hits if self.disk is not None else 0)
+        return hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
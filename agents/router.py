@@ -0,0 +1,195 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import percentile, registry
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 500):
+        """
+        Sliding window of recent latencies for one backend.
+
+        Args:
+            window: Number of most recent samples kept
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = list(self._samples)
+        return percentile(samples, q)
+
+
+class HedgedRouter:
+    def __init__(
+        self,
+        backends: List[Tuple[str, Any]],
+        hedge_percentile: float = 95.0,
+        default_delay: float = 2.0,
+        min_delay: float = 0.05,
+        min_samples: int = 20,
+        window: int = 500
+    ):
+        """
+        Route prompts to LLM backends, hedging slow requests onto the next one.
+
+        The first backend gets every request. If it has not answered once its
+        observed latency percentile has passed, the same prompt goes to the
+        next backend as well, and the first answer wins. A backend that fails
+        (raises or returns None) is hedged right away, so a primary whose
+        circuit breaker is open costs no delay at all. Backends are GPT-like
+        objects with an acall() taking the GPT.call arguments.
+
+        The losing request is cancelled, which closes its connection. The
+        sync call() runs acall() on a private event loop, so it cancels
+        losers the same way.
+
+        Responses a backend served from its cache (served_from_cache is set)
+        say nothing about its latency and are left out of the percentiles.
+
+        Args:
+            backends: Ordered (name, backend) pairs, primary first
+            hedge_percentile: Latency percentile of a backend after which to hedge
+            default_delay: Hedge delay in seconds until a backend has min_samples
+            min_delay: Lower bound on the hedge delay in seconds
+            min_samples: Samples needed before the observed percentile is trusted
+            window: Recent latencies kept per backend
+        """
+        if not backends:
+            raise ValueError("At least one backend is required")
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latency: Dict[str, LatencyTracker] = {name: LatencyTracker(window) for name, _ in self.backends}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, name: str) -> float:
+        """Seconds to wait on a backend before hedging to the next one."""
+        tracker = self.latency[name]
+        if len(tracker) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, tracker.percentile(self.hedge_percentile))
+
+    def _record(self, name: str, seconds: float, result: Optional[str], backend: Any) -> None:
+        # Failures return fast and would drag the threshold down, so only successes count.
+        if result is None:
+            registry.incr(f"backend_{name}_failures")
+        elif not getattr(backend, "served_from_cache", False):
+            self.latency[name].record(seconds)
+            registry.observe(f"backend_{name}", seconds)
+
+    async def _atimed(self, name: str, backend: Any, args: tuple, kwargs: dict) -> Optional[str]:
+        start = time.perf_counter()
+        try:
+            result = await backend.acall(*args, **kwargs)
+        except Exception:
+            registry.incr(f"backend_{name}_failures")
+            raise
+        self._record(name, time.perf_counter() - start, result, backend)
+        return result
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop of the sync path, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="hedge", daemon=True).start()
+            return self._loop
+
+    def call(self, *args, **kwargs) -> Optional[str]:
+        """
+        Send a prompt through the backends with hedging.
+
+        Blocks the calling thread while acall() runs on the router's private
+        event loop.
+
+        Args:
+            *args, **kwargs: GPT.call arguments passed to every backend
+
+        Returns:
+            str: The first successful response, or None if every backend failed.
+
+        Raises:
+            Exception: The last error raised, if every backend failed and one of them raised.
+        """
+        loop = self._background_loop()
+        outcome = concurrent.futures.Future()
+
+        def copy_outcome(task):
+            if task.cancelled():
+                outcome.cancel()
+            elif task.exception() is not None:
+                outcome.set_exception(task.exception())
+            else:
+                outcome.set_result(task.result())
+
+        def start():
+            loop.create_task(self.acall(*args, **kwargs)).add_done_callback(copy_outcome)
+
+        # The task copies the caller's context, so metrics land on its row.
+        loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return outcome.result()
+
+    async def acall(self, *args, **kwargs) -> Optional[str]:
+        """
+        Send a prompt through the backends with hedging; the losing request is cancelled.
+
+        Args:
+            *args, **kwargs: GPT.call arguments passed to every backend
+
+        Returns:
+            str: The first successful response, or None if every backend failed.
+
+        Raises:
+            Exception: The last error raised, if every backend failed and one of them raised.
+        """
+        waiting = list(self.backends)
+        running = {}
+        error = None
+        try:
+            while waiting or running:
+                if waiting:
+                    name, backend = waiting.pop(0)
+                    running[asyncio.ensure_future(self._atimed(name, backend, args, kwargs))] = name
+                    if len(waiting) < len(self.backends) - 1:
+                        registry.incr("router_backups")
+                timeout = self.hedge_delay(name) if waiting else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if result is not None:
+                        registry.incr(f"router_wins_{winner}")
+                        return result
+            if error is not None:
+                raise error
+            return None
+        finally:
+            for task in running:
+                task.cancel()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
@@ -1,42 +1,588 @@
-import requests
-from typing import Dict, Any
+import asyncio
+import hashlib
+import json
+import time
+from functools import partial
 
-class SerperAgent:
-    def __init__(self, api_key: str):
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from backoff import RETRY_STATUSES, backoff_delay, retry_after_seconds
+from disk_cache import DiskCache
+from metrics import registry
+from rate_limit import CreditBudget, TokenBucket
+from singleflight import SingleFlight
+
+# Projectable top-level fields and the Serper response keys they come from.
+PROJECTION_FIELDS = {
+    "organic": "organic",
+    "knowledge_graph": "knowledgeGraph",
+    "places": "places",
+    "credits": "credits",
+}
+
+
+class OrganicResult:
+    __slots__ = ("title", "link", "snippet", "position")
+
+    def __init__(self, title: Optional[str], link: Optional[str], snippet: Optional[str], position: Optional[int]):
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.position = position
+
+    def __repr__(self):
+        return f"OrganicResult(position={self.position!r}, title={self.title!r})"
+
+
+class SearchResult:
+    __slots__ = ("query", "organic", "knowledge_graph_type", "place_types", "credits")
+
+    def __init__(self, query, organic=None, knowledge_graph_type=None, place_types=None, credits=None):
+        """
+        Compact projection of a Serper search response.
+
+        Fields that were not requested are left as None.
+        """
+        self.query = query
+        self.organic: Optional[Tuple[OrganicResult, ...]] = organic
+        self.knowledge_graph_type: Optional[str] = knowledge_graph_type
+        self.place_types: Optional[Tuple[str, ...]] = place_types
+        self.credits: Optional[int] = credits
+
+    @property
+    def snippet(self) -> Optional[str]:
+        """Snippet of the top organic result, if any."""
+        return self.organic[0].snippet if self.organic else None
+
+    def __repr__(self):
+        return f"SearchResult(query={self.query!r}, organic={len(self.organic or ())} results)"
+
+
+def project(data: Dict[str, Any], fields: Iterable[str], organic_limit: Optional[int] = None) -> SearchResult:
+    """
+    Project a decoded Serper response onto a SearchResult.
+
+    Args:
+        data: Decoded search response
+        fields: Names from PROJECTION_FIELDS to keep
+        organic_limit: Keep at most this many organic results
+
+    Returns:
+        SearchResult holding only the requested fields
+    """
+    fields = set(fields)
+    unknown = fields - PROJECTION_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Unknown projection fields: {sorted(unknown)}")
+
+    result = SearchResult((data.get("searchParameters") or {}).get("q"))
+    if "organic" in fields:
+        organic = data.get("organic") or []
+        result.organic = tuple(
+            OrganicResult(item.get("title"), item.get("link"), item.get("snippet"), item.get("position"))
+            for item in organic[:organic_limit]
+        )
+    if "knowledge_graph" in fields:
+        result.knowledge_graph_type = (data.get("knowledgeGraph") or {}).get("type")
+    if "places" in fields:
+        places = data.get("places") or []
+        types = (place.get("category") or place.get("type") for place in places)
+        result.place_types = tuple(place_type for place_type in types if place_type)
+    if "credits" in fields:
+        result.credits = data.get("credits")
+    return result
+
+
+def _decode(raw: Union[str, bytes], fields: Optional[Iterable[str]] = None, organic_limit: Optional[int] = None):
+    with registry.timer("json_parse"):
+        data = _loads(raw)
+        if fields is None:
+            return data
+        return project(data, fields, organic_limit)
+
+
+def cache_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """
+    Build the search cache key for a request.
+
+    The query is case-folded and whitespace-collapsed so trivially different
+    spellings share an entry; the endpoint and every other parameter are part
+    of the key.
+
+    Args:
+        endpoint: API path such as "/search"
+        payload: Request parameters including "q"
+
+    Returns:
+        Hex digest identifying the request
+    """
+    params = dict(payload)
+    params["q"] = " ".join(str(params.get("q", "")).casefold().split())
+    blob = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class _SerperBase:
+    """Caching, rate limiting and credit bookkeeping shared by the sync and async agents."""
+
+    cache: Optional[DiskCache] = None
+    cache_ttl: Optional[float] = None
+    rate_limiter: Optional[TokenBucket] = None
+    budget: Optional[CreditBudget] = None
+    inflight: Optional[SingleFlight] = None
+
+    def _setup_limits(
+        self,
+        qps: Optional[float],
+        burst: Optional[float],
+        credit_budget: Optional[float],
+        coalesce: bool
+    ) -> None:
+        self.rate_limiter = TokenBucket(qps, burst) if qps else None
+        self.budget = CreditBudget(credit_budget) if credit_budget else None
+        self.inflight = SingleFlight("serper") if coalesce else None
+
+    @staticmethod
+    def _credits(payload: Any) -> int:
+        """Credits to reserve for a request: one per query."""
+        return len(payload) if isinstance(payload, list) else 1
+
+    def _reserve(self, credits: int) -> None:
+        if self.budget is not None:
+            self.budget.reserve(credits)
+
+    def _release(self, credits: int) -> None:
+        # Failed requests are not billed.
+        if self.budget is not None:
+            self.budget.settle(credits, 0)
+
+    def _spend(self, items: List[Any], reserved: int) -> None:
+        # Serper reports the credits each search cost; assume 1 if it does not.
+        if self.budget is not None:
+            self.budget.settle(reserved, sum(item.get("credits", 1) if isinstance(item, dict) else 1 for item in items))
+
+    def _parse_response(self, raw: Union[str, bytes]) -> Dict[str, Any]:
+        with registry.timer("json_parse"):
+            data = _loads(raw)
+        self._spend([data], 1)
+        return data
+
+    def _cache_get(self, endpoint: str, payload: Dict[str, Any], fields=None, organic_limit=None):
+        if self.cache is None:
+            return None
+        text = self.cache.get(cache_key(endpoint, payload))
+        if text is None:
+            return None
+        return _decode(text, fields, organic_limit)
+
+    def _cache_set(self, endpoint: str, payload: Dict[str, Any], text: str) -> None:
+        if self.cache is not None:
+            self.cache.set(cache_key(endpoint, payload), text, ttl=self.cache_ttl)
+
+
+class SerperAgent(_SerperBase):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://google.serper.dev",
+        pool_size: int = 10,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 15.0),
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        cache: Optional[DiskCache] = None,
+        cache_ttl: Optional[float] = None,
+        qps: Optional[float] = None,
+        burst: Optional[float] = None,
+        credit_budget: Optional[float] = None,
+        coalesce: bool = True
+    ):
         """
         Initialize the Serper API client.
-        
+
+        Requests go through one pooled keep-alive session, so connections are
+        reused instead of paying a new TCP and TLS handshake per query.
+        Outbound requests can be paced by a token bucket shared by every
+        thread using this agent, and a run can be capped by a credit budget.
+
         Args:
             api_key: Your Serper API key
+            base_url: Serper API root URL
+            pool_size: Maximum number of pooled connections (match your concurrency)
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            max_retries: Retries for connection errors, timeouts, 429s and 5xx responses
+            backoff_base: Delay ceiling of the first retry in seconds
+            backoff_cap: Upper bound on the jittered backoff delay in seconds
+            cache: Optional DiskCache for search results; hits skip the network
+            cache_ttl: Time to live of cached results (defaults to the cache TTL)
+            qps: Maximum sustained requests per second (None for no limit)
+            burst: Requests allowed at once before qps pacing applies
+            credit_budget: Credits this agent may spend before raising BudgetExhausted
+            coalesce: Share one upstream request between concurrent identical searches
         """
         self.api_key = api_key
-        self.base_url = "https://google.serper.dev"
+        self.base_url = base_url
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._setup_limits(qps, burst, credit_budget, coalesce)
         self.headers = {
             "X-API-KEY": self.api_key,
             "Content-Type": "application/json"
         }
-    
-    def search(self, query: str) -> Dict[str, Any]:
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _post(self, path: str, payload: Any) -> "requests.Response":
+        """
+        POST to the Serper API, retrying transient failures.
+
+        Connection errors, timeouts, 429s and 5xx responses are retried with
+        jittered exponential backoff; a Retry-After header takes precedence
+        over the computed delay. Every attempt waits for the rate limiter.
+
+        Each attempt first reserves one credit per query in the payload. A
+        failed attempt releases its reservation; after a successful one the
+        caller settles it with the credits the response reports (_spend).
+
+        Raises:
+            requests.exceptions.RequestException: If the request still fails
+            BudgetExhausted: If the credit budget cannot cover the request
+        """
+        requests = self._requests
+        url = f"{self.base_url}{path}"
+        credits = self._credits(payload)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self._reserve(credits)
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._release(credits)
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            except Exception:
+                self._release(credits)
+                raise
+            else:
+                if response.ok:
+                    return response
+                self._release(credits)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            registry.incr("serper_retries")
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(
+        self,
+        query: str,
+        fields: Optional[Iterable[str]] = None,
+        organic_limit: Optional[int] = None,
+        **params: Any
+    ) -> Union[Dict[str, Any], SearchResult]:
         """
         Perform a search using the Serper API.
         
         Args:
             query: The search query string
+            fields: If given, return a compact SearchResult holding only these
+                PROJECTION_FIELDS instead of the full response dict
+            organic_limit: With fields, keep at most this many organic results
+            **params: Extra Serper parameters such as gl, hl or num
             
         Returns:
-            Dict containing the search results
+            Dict containing the search results, or a SearchResult when projecting
             
         Raises:
             requests.exceptions.RequestException: If the API request fails
         """
-        payload = {"q": query}
-        response = requests.post(
-            f"{self.base_url}/search",
-            headers=self.headers,
-            json=payload
+        payload = {"q": query, **params}
+        cached = self._cache_get("/search", payload, fields, organic_limit)
+        if cached is not None:
+            return cached
+
+        if self.inflight is not None:
+            data = self.inflight.do(cache_key("/search", payload), partial(self._fetch, "/search", payload))
+        else:
+            data = self._fetch("/search", payload)
+        return data if fields is None else project(data, fields, organic_limit)
+
+    def _fetch(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with registry.timer("serper_request"):
+            response = self._post(path, payload)
+        self._cache_set(path, payload, response.text)
+        return self._parse_response(response.content)
+
+    def search_batch(
+        self,
+        queries: List[str],
+        batch_size: int = 100,
+        fields: Optional[Iterable[str]] = None,
+        organic_limit: Optional[int] = None
+    ) -> List[Optional[Union[Dict[str, Any], SearchResult]]]:
+        """
+        Perform many searches using Serper's multi-query requests.
+
+        Queries are sent in groups of batch_size per HTTP request and each
+        response is mapped back to its query by position. If a whole group
+        fails, or individual entries come back as errors, those queries are
+        retried one by one with search(). Cached queries are not sent at all.
+
+        Args:
+            queries: The search query strings
+            batch_size: Maximum number of queries per request (Serper allows 100)
+            fields: Project each result onto these fields (see search)
+            organic_limit: With fields, keep at most this many organic results
+
+        Returns:
+            List of search results in the same order as queries; an entry is
+            None if that query still failed after its individual retry
+        """
+        requests = self._requests
+        results: List[Optional[Union[Dict[str, Any], SearchResult]]] = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            results[i] = self._cache_get("/search", {"q": query}, fields, organic_limit)
+            if results[i] is None:
+                pending.append(i)
+
+        for offset in range(0, len(pending), batch_size):
+            positions = pending[offset:offset + batch_size]
+            group = [queries[i] for i in positions]
+            try:
+                with registry.timer("serper_batch_request"):
+                    response = self._post("/search", [{"q": query} for query in group])
+                data = _decode(response.content)
+                if not isinstance(data, list) or len(data) != len(group):
+                    # The group stays reserved: it may well have been billed.
+                    raise ValueError(f"expected {len(group)} results, got {type(data).__name__}")
+                self._spend(data, len(group))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Batch search of {len(group)} queries failed ({e}), retrying individually")
+                data = [None] * len(group)
+
+            for i, query, item in zip(positions, group, data):
+                if self._is_result(item):
+                    self._cache_set("/search", {"q": query}, json.dumps(item))
+                    if fields is not None:
+                        item = project(item, fields, organic_limit)
+                else:
+                    try:
+                        item = self.search(query, fields=fields, organic_limit=organic_limit)
+                    except requests.exceptions.RequestException as e:
+                        print(f"Search failed for {query!r}: {e}")
+                        item = None
+                results[i] = item
+        return results
+
+    @staticmethod
+    def _is_result(item: Any) -> bool:
+        return isinstance(item, dict) and "statusCode" not in item and "error" not in item
+
+
+class AsyncSerperAgent(_SerperBase):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://google.serper.dev",
+        max_concurrency: int = 100,
+        pool_size: int = 100,
+        timeout: float = 15.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        cache: Optional[DiskCache] = None,
+        cache_ttl: Optional[float] = None,
+        qps: Optional[float] = None,
+        burst: Optional[float] = None,
+        credit_budget: Optional[float] = None,
+        coalesce: bool = True
+    ):
+        """
+        Initialize the asyncio Serper API client.
+
+        All requests share one httpx.AsyncClient connection pool and at most
+        max_concurrency of them are in flight at once, so thousands of queries
+        can be scheduled from a single event loop without blocking it.
+
+        Args:
+            api_key: Your Serper API key
+            base_url: Serper API root URL
+            max_concurrency: Maximum number of requests in flight
+            pool_size: Maximum number of pooled connections
+            timeout: Read timeout in seconds
+            max_retries: Retries for transport errors, 429s and 5xx responses
+            backoff_base: Delay ceiling of the first retry in seconds
+            backoff_cap: Upper bound on the jittered backoff delay in seconds
+            cache: Optional DiskCache for search results; hits skip the network
+            cache_ttl: Time to live of cached results (defaults to the cache TTL)
+            qps: Maximum sustained requests per second (None for no limit)
+            burst: Requests allowed at once before qps pacing applies
+            credit_budget: Credits this agent may spend before raising BudgetExhausted
+            coalesce: Share one upstream request between concurrent identical searches
+        """
+        import httpx
+
+        self._httpx = httpx
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._setup_limits(qps, burst, credit_budget, coalesce)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-API-KEY": self.api_key, "Content-Type": "application/json"},
+            timeout=httpx.Timeout(timeout, connect=3.05),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
         )
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return response.json()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _post(self, path: str, payload: Any):
+        """
+        POST to the Serper API, retrying transient failures.
+
+        The concurrency slot is only held while a request is in flight, not
+        while backing off. Every attempt waits for the rate limiter and
+        reserves credits like SerperAgent._post.
+
+        Raises:
+            httpx.HTTPError: If the request still fails
+            BudgetExhausted: If the credit budget cannot cover the request
+        """
+        httpx = self._httpx
+        credits = self._credits(payload)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            self._reserve(credits)
+            try:
+                async with self._semaphore:
+                    response = await self.client.post(path, json=payload)
+            except httpx.TransportError:
+                self._release(credits)
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            except BaseException:
+                # Includes cancellation, which must not keep the credits reserved.
+                self._release(credits)
+                raise
+            else:
+                if response.is_success:
+                    return response
+                self._release(credits)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            registry.incr("serper_retries")
+            await asyncio.sleep(delay)
+
+    async def asearch(
+        self,
+        query: str,
+        fields: Optional[Iterable[str]] = None,
+        organic_limit: Optional[int] = None,
+        **params: Any
+    ) -> Union[Dict[str, Any], SearchResult]:
+        """
+        Perform a search using the Serper API without blocking the event loop.
+
+        Args:
+            query: The search query string
+            fields: If given, return a compact SearchResult (see SerperAgent.search)
+            organic_limit: With fields, keep at most this many organic results
+            **params: Extra Serper parameters such as gl, hl or num
+
+        Returns:
+            Dict containing the search results, or a SearchResult when projecting
+
+        Raises:
+            httpx.HTTPError: If the API request fails
+        """
+        payload = {"q": query, **params}
+        cached = self._cache_get("/search", payload, fields, organic_limit)
+        if cached is not None:
+            return cached
+
+        if self.inflight is not None:
+            data = await self.inflight.ado(cache_key("/search", payload), partial(self._afetch, "/search", payload))
+        else:
+            data = await self._afetch("/search", payload)
+        return data if fields is None else project(data, fields, organic_limit)
+
+    async def _afetch(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with registry.timer("serper_request"):
+            response = await self._post(path, payload)
+        self._cache_set(path, payload, response.text)
+        return self._parse_response(response.content)
+
+    async def asearch_many(
+        self,
+        queries: List[str],
+        return_exceptions: bool = True,
+        fields: Optional[Iterable[str]] = None,
+        organic_limit: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Run many searches concurrently, bounded by max_concurrency.
+
+        Args:
+            queries: The search query strings
+            return_exceptions: Put a failed query's exception in its slot
+                instead of raising the first failure
+            fields: Project each result onto these fields (see SerperAgent.search)
+            organic_limit: With fields, keep at most this many organic results
+
+        Returns:
+            Search results in the same order as queries
+        """
+        searches = (self.asearch(query, fields=fields, organic_limit=organic_limit) for query in queries)
+        return await asyncio.gather(*searches, return_exceptions=return_exceptions)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
 
 # Example usage:
 if __name__ == "__main__":
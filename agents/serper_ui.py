@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import os
+from disk_cache import DiskCache
 from serper import SerperAgent
 
 def format_search_results(results):
@@ -19,6 +20,11 @@ def format_search_results(results):
     
     return pd.DataFrame(formatted_results)
 
+@st.cache_resource
+def get_search_cache():
+    """Open the on-disk search cache once per Streamlit server process."""
+    return DiskCache(os.getenv("SERPER_CACHE_PATH", "serper_cache.sqlite"), name="serper_cache")
+
 def main():
     st.set_page_config(
         page_title="Serper Search",
@@ -46,7 +52,7 @@ def main():
     if st.button("Search") and search_query and api_key:
         with st.spinner("Searching..."):
             try:
-                agent = SerperAgent(api_key=api_key)
+                agent = SerperAgent(api_key=api_key, cache=get_search_cache())
                 results = agent.search(search_query)
                 
                 # Display search parameters
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+from metrics import registry
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        """
+        Coalesce concurrent calls that share a key into one upstream call.
+
+        The first caller for a key runs the function; callers arriving while
+        it is in flight wait for it and receive the same result or exception.
+        Nothing is remembered once the call completes.
+
+        Args:
+            name: Prefix of the coalesced-calls counter in the metrics registry
+        """
+        self.name = name
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    def _count_coalesced(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+        registry.incr(f"{self.name}_coalesced")
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once per key across concurrent threads.
+
+        Args:
+            key: Identity of the call
+            fn: Zero-argument function performing the call
+
+        Returns:
+            The result of the shared call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count_coalesced()
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run the coroutine returned by fn once per key across concurrent tasks.
+
+        The shared task is shielded, so cancelling one waiter does not cancel
+        the call for the others.
+
+        Args:
+            key: Identity of the call
+            fn: Zero-argument function returning the coroutine to run
+
+        Returns:
+            The result of the shared call
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self._count_coalesced()
+        return await asyncio.shield(task)
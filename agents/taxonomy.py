@@ -0,0 +1,432 @@
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Extra phrasings that unambiguously point at a taxonomy entry.
+SYNONYMS = {
+    "container terminal": "Marine Terminal",
+    "cargo terminal": "Marine Terminal",
+    "port terminal": "Marine Terminal",
+    "elementary": "Elementary School",
+    "grade school": "Elementary School",
+    "junior high": "Middle School",
+    "secondary school": "High School",
+    "gas station": "Fuel Station",
+    "petrol station": "Fuel Station",
+    "filling station": "Fuel Station",
+    "fulfillment center": "Distribution Center",
+    "logistics center": "Distribution Center",
+    "grocery": "Grocery Store",
+    "coffeehouse": "Coffee Shop",
+    "coffeeshop": "Coffee Shop",
+    "motor inn": "Motel",
+    "self storage": "Storage Facility",
+    "nursing facility": "Nursing Home",
+    "urgent care": "Urgent Care Center",
+}
+
+# Serper knowledge-graph and place types (Google Maps categories) whose name
+# differs from the taxonomy entry they correspond to. Types that already equal
+# a category name are matched without an entry here.
+SERPER_TYPE_MAP = {
+    "container terminal": "Marine Terminal",
+    "shipping terminal": "Marine Terminal",
+    "primary school": "Elementary School",
+    "public school": "Primary and Secondary School",
+    "gas station": "Fuel Station",
+    "trucking company": "Shipping, Freight, and Material Transportation Service",
+    "freight forwarding service": "Shipping, Freight, and Material Transportation Service",
+    "logistics service": "Shipping, Freight, and Material Transportation Service",
+    "distribution service": "Distribution Center",
+    "self-storage facility": "Storage Facility",
+    "corporate office": "Office Building",
+    "apartment building": "Apartment or Condo",
+    "apartment complex": "Apartment or Condo",
+    "condominium complex": "Apartment or Condo",
+    "assisted living facility": "Assisted Living",
+    "day care center": "Daycare",
+    "child care agency": "Child Care Service",
+    "medical clinic": "Healthcare Clinic",
+    "police department": "Police Station",
+    "catholic church": "Church",
+    "baptist church": "Church",
+    "methodist church": "Church",
+    "drug store": "Drugstore",
+    "car dealer": "Car Dealership",
+    "auto repair shop": "Automotive Repair Shop",
+    "auto parts store": "Car Parts and Accessories",
+    "hamburger restaurant": "Burger Joint",
+    "pizza restaurant": "Pizzeria",
+    "sandwich shop": "Sandwich Spot",
+    "cafe": "Café",
+    "fitness center": "Gym",
+    "train station": "Rail Station",
+}
+
+# Entries that show up in almost every address snippet ("Main Street",
+# "Laramie County") or are too vague to assign without the LLM.
+AMBIGUOUS = {
+    "Bar", "Bay", "City", "Country", "County", "Education", "Event", "Fair",
+    "Field", "Hill", "Home (private)", "Intersection", "Island", "Lake", "Line",
+    "Lodging", "Market", "Mountain", "Moving Target", "Neighborhood", "Office",
+    "Parking", "Plane", "Platform", "Plaza", "Retail", "River", "State",
+    "States and Municipalities", "Street", "Structure", "Town", "Track", "Train",
+    "Tree", "Village", "Well",
+}
+
+
+def parse_categories(text: str) -> List[str]:
+    """
+    Parse the newline separated categories text into a list of names.
+
+    Args:
+        text: One category per line; blank lines are ignored
+
+    Returns:
+        Unique category names in their original order
+    """
+    names = []
+    seen = set()
+    for line in text.splitlines():
+        name = line.strip()
+        if name and name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def _stem(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """
+    Lowercase, strip accents and split text into crudely singularized tokens.
+
+    Args:
+        text: Free text such as a search snippet or a category name
+
+    Returns:
+        Tuple of tokens
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return tuple(_stem(token) for token in re.findall(r"[a-z0-9]+", text))
+
+
+# End of the clause that names a snippet's subject: sentence and clause
+# punctuation, or a spaced dash.
+_CLAUSE_END = re.compile(r"[.;:!?|(]|\s[-\u2013\u2014]\s")
+
+
+def subject_clause(text: str) -> str:
+    """
+    Return the first clause of a snippet, where its subject is described.
+
+    Everything after it tends to list nearby places ("Nearby: Walmart, bus
+    stop") rather than the place itself.
+    """
+    found = _CLAUSE_END.search(text)
+    return text[:found.start()] if found else text
+
+
+class LexicalMatcher:
+    def __init__(self, names: List[str], synonyms: Optional[Dict[str, str]] = None, ambiguous=AMBIGUOUS, window: int = 12):
+        """
+        Precompiled phrase index over the category taxonomy.
+
+        Args:
+            names: Category names to match
+            synonyms: Extra phrase -> category name mappings (defaults to SYNONYMS)
+            ambiguous: Category names that are never assigned locally
+            window: Tokens at the start of the subject clause a match must lie within
+        """
+        synonyms = SYNONYMS if synonyms is None else synonyms
+        known = set(names)
+
+        self.index: Dict[Tuple[str, ...], str] = {}
+        for name in names:
+            if name not in ambiguous:
+                self.index.setdefault(tokenize(name), name)
+        for phrase, name in synonyms.items():
+            if name not in known:
+                raise ValueError(f"Synonym '{phrase}' maps to unknown category '{name}'")
+            self.index[tokenize(phrase)] = name
+        self.index.pop((), None)
+        self.max_len = max(len(key) for key in self.index)
+        self.window = window
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def candidates(self, text: str) -> List[str]:
+        """
+        Find the categories mentioned in text, preferring the longest phrases.
+
+        A match nested inside a longer one ("School" inside "Elementary School")
+        is dropped.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Distinct matching category names in order of appearance
+        """
+        names = []
+        for _, _, name in self._spans(tokenize(text)):
+            if name not in names:
+                names.append(name)
+        return names
+
+    def _spans(self, tokens: Tuple[str, ...]) -> List[Tuple[int, int, str]]:
+        """Non-overlapping (start, end, name) matches, longest phrases first, in token order."""
+        spans = []
+        for start in range(len(tokens)):
+            for length in range(min(self.max_len, len(tokens) - start), 0, -1):
+                name = self.index.get(tokens[start:start + length])
+                if name:
+                    spans.append((start, start + length, name))
+                    break
+
+        spans.sort(key=lambda span: span[0] - span[1])
+        taken = []
+        for start, end, name in spans:
+            if all(end <= s or start >= e for s, e, _ in taken):
+                taken.append((start, end, name))
+        return sorted(taken)
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Return the category for text if its subject names exactly one category.
+
+        Only matches starting within the first window tokens of the first
+        clause count, so a snippet such as "A single family home. Nearby: bus
+        stop" is not read as a bus stop.
+
+        Args:
+            text: Text to scan, typically a search snippet
+
+        Returns:
+            Category name, or None if nothing or more than one category matched
+        """
+        spans = self._spans(tokenize(subject_clause(text or "")))
+        names = {name for start, _, name in spans if start < self.window}
+        category = names.pop() if len(names) == 1 else None
+        with self._lock:
+            self.lookups += 1
+            if category:
+                self.hits += 1
+        return category
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class EntityTypeMapper:
+    def __init__(self, names: List[str], type_map: Optional[Dict[str, str]] = None, ambiguous=AMBIGUOUS):
+        """
+        Lookup from Serper entity types to taxonomy categories.
+
+        A type maps when it names a category outright ("Elementary school") or
+        appears in the type map ("Container terminal").
+
+        Args:
+            names: Category names to map onto
+            type_map: Extra Serper type -> category name mappings (defaults to SERPER_TYPE_MAP)
+            ambiguous: Category names that are never assigned from a type name alone
+        """
+        type_map = SERPER_TYPE_MAP if type_map is None else type_map
+        known = set(names)
+
+        self.index: Dict[Tuple[str, ...], str] = {}
+        for name in names:
+            if name not in ambiguous:
+                self.index.setdefault(tokenize(name), name)
+        for entity_type, name in type_map.items():
+            if name not in known:
+                raise ValueError(f"Serper type '{entity_type}' maps to unknown category '{name}'")
+            self.index[tokenize(entity_type)] = name
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, entity_type: Optional[str]) -> Optional[str]:
+        """Return the category for a single Serper type, if mapped."""
+        return self.index.get(tokenize(entity_type)) if entity_type else None
+
+    def match(self, knowledge_graph_type: Optional[str] = None, place_types=()) -> Optional[str]:
+        """
+        Categorize a search result from its structured entity types.
+
+        The knowledge-graph type describes the searched entity itself and wins
+        when mapped. Place results can include neighbouring businesses, so they
+        are only used when every mapped place type agrees.
+
+        Args:
+            knowledge_graph_type: Type of the knowledge-graph panel, if any
+            place_types: Types of the place results, if any
+
+        Returns:
+            Category name, or None if no type maps unambiguously
+        """
+        category = self.lookup(knowledge_graph_type)
+        if category is None:
+            mapped = {self.lookup(place_type) for place_type in place_types or ()} - {None}
+            category = mapped.pop() if len(mapped) == 1 else None
+        with self._lock:
+            self.lookups += 1
+            if category:
+                self.hits += 1
+        return category
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+def build_category_prompt(names: List[str]) -> str:
+    """
+    Build the system prompt listing every category by name.
+
+    The model answers with a name, which parse_category_name validates, so
+    the listing carries no IDs. The prompt only depends on the taxonomy, so
+    it is identical across calls and can be served from the provider's
+    prompt cache.
+
+    Args:
+        names: Category names
+
+    Returns:
+        System prompt string
+    """
+    return (
+        "Classify the place described by the user into exactly one of the categories below. "
+        "Reply with the category name only, exactly as listed.\n\n" + "\n".join(names)
+    )
+
+
+def parse_category_name(answer: Optional[str], names: List[str]) -> Optional[str]:
+    """
+    Map a model answer back to a category name.
+
+    Casing, punctuation, plurals and spacing are ignored, so "pizzerias." is
+    accepted as "Pizzeria"; anything else must name a category exactly.
+
+    Args:
+        answer: Raw model output, expected to be one category name
+        names: Valid category names
+
+    Returns:
+        Category name, or None if the answer names no category
+    """
+    key = _match_key(answer or "")
+    if not key:
+        return None
+    lookup = _name_lookup(tuple(names))
+    return lookup.get(key) or lookup.get(key.replace(" ", ""))
+
+
+def _match_key(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+@lru_cache(maxsize=8)
+def _name_lookup(names: Tuple[str, ...]) -> Dict[str, str]:
+    """Normalized key (with and without spaces) -> category name."""
+    lookup = {}
+    for name in names:
+        key = _match_key(name)
+        lookup.setdefault(key, name)
+        lookup.setdefault(key.replace(" ", ""), name)
+    return lookup
+
+
+def _trigram_vectors(strings, vocab):
+    import numpy as np
+
+    matrix = np.zeros((len(strings), len(vocab)), dtype=np.float32)
+    for row, text in enumerate(strings):
+        padded = f"  {text} "
+        for k in range(len(padded) - 2):
+            col = vocab.get(padded[k:k + 3])
+            if col is not None:
+                matrix[row, col] += 1
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _fuzzy_scores(queries, choices):
+    """Score every query against every choice on a 0-100 scale."""
+    try:
+        from rapidfuzz import fuzz, process
+    except ImportError:
+        process = None
+
+    if process is not None:
+        return process.cdist(queries, choices, scorer=fuzz.ratio, workers=-1)
+
+    vocab = {}
+    for text in choices:
+        padded = f"  {text} "
+        for k in range(len(padded) - 2):
+            vocab.setdefault(padded[k:k + 3], len(vocab))
+    return (_trigram_vectors(queries, vocab) @ _trigram_vectors(choices, vocab).T) * 100
+
+
+def canonicalize_categories(values, names: List[str], score_cutoff: float = 85.0):
+    """
+    Map a whole column of raw category answers onto taxonomy entries.
+
+    The column is factorized so each distinct value is resolved once: first by
+    exact lookup on the normalized form (casing, punctuation, plurals and
+    spacing folded), then by a vectorized fuzzy score matrix for the rest
+    (rapidfuzz cdist when installed, a NumPy trigram cosine matrix otherwise).
+
+    Args:
+        values: Sequence or pandas Series of raw category strings
+        names: Canonical category names
+        score_cutoff: Minimum fuzzy score (0-100) to accept a match
+
+    Returns:
+        Tuple of (canonical, matched) NumPy arrays; canonical holds the taxonomy
+        name or None, matched flags the rows that were mapped
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    uniques = [str(value) for value in uniques]
+
+    lookup = _name_lookup(tuple(names))
+
+    resolved = np.empty(len(uniques) + 1, dtype=object)
+    resolved[:] = None
+    pending = []
+    for i, value in enumerate(uniques):
+        key = _match_key(value)
+        name = lookup.get(key) or lookup.get(key.replace(" ", ""))
+        if name:
+            resolved[i] = name
+        elif key:
+            pending.append(i)
+
+    if pending:
+        choices = list(lookup)
+        scores = np.asarray(_fuzzy_scores([_match_key(uniques[i]) for i in pending], choices))
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(pending)), best]
+        for i, choice, score in zip(pending, best, best_scores):
+            if score >= score_cutoff:
+                resolved[i] = lookup[choices[choice]]
+
+    # NA rows carry code -1, which indexes the trailing None slot.
+    matched = np.array([name is not None for name in resolved])
+    return resolved[codes], matched[codes]
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# The agents modules are flat scripts that import each other by bare name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import OpenAIStub, SerperStub, StubBehavior, start_stub
+
+
+@pytest.fixture
+def stub():
+    """Start a loadtest stub handler on a free port; returns its base URL. Servers stop after the test."""
+    servers = []
+
+    def start(handler, median_ms=1.0, sigma=0.0, **behavior):
+        server, url = start_stub(handler, StubBehavior(median_ms, sigma, **behavior))
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def agent(stub):
+    """SerperAgent talking to the loadtest Serper stub."""
+    from serper import SerperAgent
+
+    with SerperAgent("stub", base_url=stub(SerperStub), backoff_base=0.01) as agent:
+        yield agent
+
+
+@pytest.fixture
+def gpt(stub):
+    """GPT talking to the loadtest OpenAI stub."""
+    from open_ai import GPT
+
+    return GPT(api_key="stub", base_url=f"{stub(OpenAIStub)}/v1", backoff_base=0.01)
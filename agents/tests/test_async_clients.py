@@ -0,0 +1,44 @@
+import asyncio
+
+from anthropic import Claude
+from loadtest import _StubHandler
+
+
+class _MessagesStub(_StubHandler):
+    """Minimal Anthropic Messages API stand-in."""
+
+    def respond(self, payload):
+        return {"content": [{"type": "text", "text": "Fuel Station"}], "usage": {"input_tokens": 3, "output_tokens": 2}}
+
+
+def _ask(model):
+    return model.acall(system_prompt="Classify.", user_prompt="Shell gas station", temperature=0)
+
+
+def test_gpt_acall_works_across_event_loops(gpt):
+    assert asyncio.run(_ask(gpt))
+    assert asyncio.run(_ask(gpt))
+
+
+def test_gpt_acall_reopens_a_closed_client(gpt):
+    async def main():
+        first = gpt.async_client
+        assert await _ask(gpt)
+        await gpt.aclose()
+        assert await _ask(gpt)
+        return first is not gpt.async_client
+
+    assert asyncio.run(main())
+
+
+def test_claude_acall_works_across_event_loops_and_after_aclose(stub):
+    claude = Claude(api_key="stub", base_url=stub(_MessagesStub))
+
+    async def ask_and_close():
+        answer = await _ask(claude)
+        await claude.aclose()
+        return answer
+
+    assert asyncio.run(_ask(claude)) == "Fuel Station"
+    assert asyncio.run(ask_and_close()) == "Fuel Station"
+    assert asyncio.run(_ask(claude)) == "Fuel Station"
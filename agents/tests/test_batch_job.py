@@ -0,0 +1,94 @@
+import json
+
+from open_ai import BatchJob
+
+
+class _FakeGPT:
+    def __init__(self):
+        self.usage = []
+
+    def _record_usage(self, prompt_tokens, completion_tokens):
+        self.usage.append((prompt_tokens, completion_tokens))
+
+
+class _FakeBatch:
+    def __init__(self, name):
+        self.output_file_id = f"{name}-output"
+        self.error_file_id = f"{name}-errors"
+
+
+def _ok(custom_id, text):
+    return {"custom_id": str(custom_id), "error": None, "response": {"status_code": 200, "body": {
+        "choices": [{"message": {"content": text}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2},
+    }}}
+
+
+def _job(tmp_path, counts, files):
+    job = BatchJob(_FakeGPT(), str(tmp_path / "batch.json"))
+    parts, start = [], 0
+    for k, count in enumerate(counts):
+        parts.append({"batch_id": f"b{k}", "start": start, "count": count, "status": "completed"})
+        start += count
+    job.state = {"count": start, "inputs": "", "batches": parts}
+    job._lines = lambda file_id: iter(files.get(file_id, []))
+    return job
+
+
+def test_results_come_back_in_input_order(tmp_path):
+    output = [_ok(2, "c"), _ok(0, "a"), _ok(3, "d"), _ok(1, "b")]
+    job = _job(tmp_path, [4], {"b0-output": output})
+
+    assert list(job.results([_FakeBatch("b0")])) == ["a", "b", "c", "d"]
+    assert len(job.gpt.usage) == 4
+
+
+def test_failed_and_missing_requests_yield_none(tmp_path):
+    output = [_ok(3, "d"), _ok(0, "a"), {"custom_id": "1", "error": None, "response": {"status_code": 500, "body": {}}}]
+    errors = [{"custom_id": "2", "error": {"message": "bad request"}}]
+    job = _job(tmp_path, [5], {"b0-output": output, "b0-errors": errors})
+
+    assert list(job.results([_FakeBatch("b0")])) == ["a", None, None, "d", None]
+
+
+def test_results_of_several_batches_are_concatenated(tmp_path):
+    files = {"b0-output": [_ok(1, "b"), _ok(0, "a")], "b1-output": [_ok(4, "e"), _ok(2, "c"), _ok(3, "d")]}
+    job = _job(tmp_path, [2, 3], files)
+
+    assert list(job.results([_FakeBatch("b0"), _FakeBatch("b1")])) == ["a", "b", "c", "d", "e"]
+
+
+def test_input_is_split_at_the_request_and_byte_limits(tmp_path):
+    class _GPT(_FakeGPT):
+        def _request(self, **prompt):
+            return prompt
+
+    job = BatchJob(_GPT(), str(tmp_path / "batch.json"))
+    job.MAX_REQUESTS = 3
+    prompts = [{"user_prompt": "x" * 10} for _ in range(7)]
+    assert [(start, count) for _, start, count, _ in job._write_parts(prompts)] == [(0, 3), (3, 3), (6, 1)]
+
+    line_bytes = len(next(job._encode(prompts[:1]))) + 1
+    job.MAX_REQUESTS = 100
+    job.MAX_BYTES = 2 * line_bytes + 1
+    parts = list(job._write_parts(prompts))
+    assert [(start, count) for _, start, count, _ in parts] == [(0, 2), (2, 2), (4, 2), (6, 1)]
+    with open(parts[1][3], encoding="utf-8") as f:
+        assert [json.loads(line)["custom_id"] for line in f] == ["2", "3"]
+
+
+def test_resume_rejects_different_prompts(tmp_path):
+    state_path = tmp_path / "batch.json"
+    state_path.write_text(json.dumps({"count": 1, "inputs": "other", "batches": []}))
+
+    class _GPT(_FakeGPT):
+        def _request(self, **prompt):
+            return prompt
+
+    job = BatchJob(_GPT(), str(state_path))
+    try:
+        job.run([{"system_prompt": "s", "user_prompt": "u"}])
+    except ValueError as e:
+        assert "different prompts" in str(e)
+    else:
+        raise AssertionError("expected a ValueError")
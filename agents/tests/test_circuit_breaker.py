@@ -0,0 +1,109 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.check()
+        breaker.failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == CLOSED
+
+    breaker.failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert error.value.retry_in == pytest.approx(10)
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    trip(breaker)
+    clock[0] += 10
+    assert breaker.state == HALF_OPEN
+
+    breaker.check()
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert error.value.retry_in == 0.0
+
+    breaker.success()
+    assert breaker.state == CLOSED
+    breaker.check()
+
+
+def test_failed_probe_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    trip(breaker)
+    clock[0] += 10
+    breaker.check()
+    breaker.failure()
+    assert breaker.state == OPEN
+
+    clock[0] += 9
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock[0] += 1
+    breaker.check()
+
+
+def test_abandoned_probe_does_not_block_forever(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    trip(breaker)
+    clock[0] += 10
+    breaker.check()
+    clock[0] += 10
+    breaker.check()
+
+
+def test_rate_limits_are_retried_without_opening_the_circuit(clock):
+    from open_ai import GPT, GPTRateLimitError, GPTServerError
+
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30.0)
+    gpt = GPT(api_key="test", max_retries=5, breaker=breaker)
+
+    for attempt in range(3):
+        assert gpt._retry_delay(GPTRateLimitError("slow down", 429, retry_after=2.0), attempt) == 2.0
+    assert breaker.state == CLOSED
+
+    gpt._retry_delay(GPTServerError("down", 503), 0)
+    gpt._retry_delay(GPTServerError("down", 503), 1)
+    assert breaker.state == OPEN
+
+
+def test_exhausted_quota_is_not_retried_and_counts_as_a_failure(stub):
+    from loadtest import OpenAIStub
+    from open_ai import GPT, GPTQuotaError
+
+    sent = []
+
+    class _BrokeOpenAI(OpenAIStub):
+        def reply(self, payload):
+            sent.append(payload)
+            self._send(429, {"error": {"code": "insufficient_quota", "type": "insufficient_quota", "message": "You exceeded your current quota"}})
+
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30.0)
+    gpt = GPT(api_key="stub", base_url=f"{stub(_BrokeOpenAI)}/v1", backoff_base=0.01, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(GPTQuotaError):
+            gpt.call("Categorize", "1 Main Street")
+    assert len(sent) == 2
+    assert breaker.state == OPEN
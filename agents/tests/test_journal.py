@@ -0,0 +1,30 @@
+from journal import Journal, row_key
+
+
+def test_records_survive_reopening(tmp_path):
+    path = str(tmp_path / "run.journal.jsonl")
+    with Journal(path) as journal:
+        journal.append({"key": "a", "category": "Park"})
+        journal.append({"key": "b", "category": "Museum"})
+
+    assert Journal(path).load() == {
+        "a": {"key": "a", "category": "Park"},
+        "b": {"key": "b", "category": "Museum"},
+    }
+
+
+def test_torn_last_line_is_skipped_and_appends_stay_readable(tmp_path):
+    path = tmp_path / "run.journal.jsonl"
+    path.write_text('{"key": "a", "category": "Park"}\n{"key": "b", "cate', encoding="utf-8")
+
+    with Journal(str(path)) as journal:
+        assert set(journal.load()) == {"a"}
+        journal.append({"key": "c", "category": "Museum"})
+
+    assert set(Journal(str(path)).load()) == {"a", "c"}
+
+
+def test_row_key_changes_with_the_address():
+    assert row_key(3, "1 Main St") == row_key(3, "1 Main St")
+    assert row_key(3, "1 Main St") != row_key(3, "2 Main St")
+    assert row_key(3, "1 Main St") != row_key(4, "1 Main St")
@@ -0,0 +1,22 @@
+import pytest
+
+from metrics import percentile
+
+
+@pytest.mark.parametrize("values, q, expected", [
+    (range(1, 11), 50, 5),
+    (range(1, 11), 90, 9),
+    (range(1, 101), 95, 95),
+    (range(1, 101), 7, 7),
+    (range(1, 101), 99, 99),
+    (range(1, 5), 0, 1),
+    (range(1, 5), 100, 4),
+    ([3], 99, 3),
+])
+def test_percentile_is_nearest_rank(values, q, expected):
+    assert percentile(list(values), q) == expected
+
+
+def test_percentile_ignores_order_and_handles_empty():
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile([], 95) == 0.0
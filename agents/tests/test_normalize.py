@@ -0,0 +1,22 @@
+import pytest
+
+from normalize import canonical_address
+
+
+@pytest.mark.parametrize("spelling", [
+    "123 North Main Street, Suite 4, Glendo 82213-1234",
+    "123 n. main st ste 4 glendo 82213",
+    "  123 NORTH MAIN STREET   SUITE 4, GLENDO, 82213 ",
+    "123 N Main Str., Suite #4 Glendo 82213-0000",
+])
+def test_spellings_of_one_address_share_a_key(spelling):
+    assert canonical_address(spelling) == "123 n main st ste 4 glendo 82213"
+
+
+def test_accents_are_folded():
+    assert canonical_address("1 Rue de l'Église, Montréal") == canonical_address("1 rue de l eglise montreal")
+
+
+def test_different_addresses_keep_different_keys():
+    assert canonical_address("123 Main Street") != canonical_address("124 Main Street")
+    assert canonical_address("10 Oak Avenue, 82213") != canonical_address("10 Oak Avenue, 82214")
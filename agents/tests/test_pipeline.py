@@ -0,0 +1,197 @@
+import pytest
+
+import main
+from loadtest import OpenAIStub, SerperStub
+from open_ai import GPT
+from rate_limit import BudgetExhausted
+from serper import SerperAgent
+
+
+class _PickySerper(SerperStub):
+    """Serper stub that rejects every query containing "broken", on its own or inside a batch."""
+
+    def reply(self, payload):
+        if isinstance(payload, list):
+            self._send(200, [
+                {"statusCode": 400, "message": "Bad query"} if "broken" in item["q"] else self._result(item["q"])
+                for item in payload
+            ])
+        elif "broken" in payload["q"]:
+            self._send(400, {"message": "Bad query"})
+        else:
+            super().reply(payload)
+
+
+class _QuickBatchOpenAI(OpenAIStub):
+    batch_seconds = 0.1
+
+
+class _OffListOpenAI(OpenAIStub):
+    """OpenAI stub that answers with a name outside the taxonomy."""
+
+    def respond(self, payload):
+        response = super().respond(payload)
+        response["choices"][0]["message"]["content"] = "Space Elevator"
+        return response
+
+
+class _BrokeOpenAI(OpenAIStub):
+    """OpenAI stub for an account that is out of quota."""
+
+    def reply(self, payload):
+        self._send(429, {"error": {"code": "insufficient_quota", "type": "insufficient_quota", "message": "You exceeded your current quota"}})
+
+
+def _snippet(query):
+    return SerperStub._result(query)["organic"][0]["snippet"]
+
+
+def test_batch_keeps_input_order(stub, gpt):
+    queries = [f"{100 + i} Main Street, {10000 + i}" for i in range(40)]
+    # Widely spread latencies make rows finish out of order.
+    agent = SerperAgent("stub", base_url=stub(SerperStub, median_ms=5.0, sigma=1.0))
+
+    results = main.categorize_batch(queries, concurrency=8, agent=agent, gpt=gpt, dedupe=False)
+
+    assert [result["snippet"] for result in results] == [_snippet(query) for query in queries]
+    assert all(result["category"] in main.CATEGORY_NAMES for result in results)
+
+
+def test_batch_isolates_failing_rows(stub, gpt):
+    queries = ["1 Main Street", "2 broken Street", "3 Main Street", "4 broken Street", "5 Main Street"]
+    agent = SerperAgent("stub", base_url=stub(_PickySerper), backoff_base=0.01)
+    seen = {}
+
+    results = main.categorize_batch(queries, concurrency=4, agent=agent, gpt=gpt, on_result=seen.__setitem__)
+
+    assert sorted(seen) == list(range(len(queries)))
+    for query, result in zip(queries, results):
+        if "broken" in query:
+            assert result["category"] is None
+            assert result["error"].startswith("HTTPError")
+            assert not result.get("stopped")
+        else:
+            assert result["error"] is None
+            assert result["category"] in main.CATEGORY_NAMES
+
+
+def test_streaming_resumes_after_the_rows_already_written(stub, gpt, tmp_path):
+    import pandas as pd
+
+    url = stub(SerperStub)
+    addresses = [f"{100 + i} Harbor Blvd, {20000 + i}" for i in range(25)]
+    input_path, output_path = tmp_path / "data.csv", tmp_path / "out.csv"
+    pd.DataFrame({"address": addresses}).to_csv(input_path, index=False)
+
+    # The budget runs out on the third row of the third chunk.
+    first = SerperAgent("stub", base_url=url, credit_budget=12)
+    written = main.categorize_csv_streaming(str(input_path), str(output_path), chunksize=5, concurrency=1, agent=first, gpt=gpt)
+    assert written == 12
+
+    second = SerperAgent("stub", base_url=url, credit_budget=1000)
+    written = main.categorize_csv_streaming(str(input_path), str(output_path), chunksize=5, concurrency=1, agent=second, gpt=gpt)
+    assert written == 13
+    assert second.budget.spent == 13
+
+    out = pd.read_csv(output_path)
+    assert out["address"].tolist() == addresses
+    assert out["category_valid"].all()
+
+
+def test_batch_searches_each_canonical_address_once(stub, gpt):
+    queries = ["12 Oak Avenue, 82213", "12 oak ave 82213", "12 OAK AVENUE, 82213-0001", "14 Oak Avenue, 82213"]
+    agent = SerperAgent("stub", base_url=stub(SerperStub), credit_budget=1000)
+
+    results = main.categorize_batch(queries, concurrency=4, agent=agent, gpt=gpt)
+
+    assert agent.budget.spent == 2
+    assert results[0] == results[1] == results[2]
+    assert results[0] is not results[1]
+    assert results[3]["snippet"] == _snippet(queries[3])
+
+
+def test_batch_without_dedupe_searches_every_row(stub, gpt):
+    queries = ["12 Oak Avenue, 82213", "12 oak ave 82213"]
+    agent = SerperAgent("stub", base_url=stub(SerperStub), credit_budget=1000)
+
+    main.categorize_batch(queries, concurrency=2, agent=agent, gpt=gpt, dedupe=False)
+
+    assert agent.budget.spent == 2
+
+
+def test_streaming_output_tells_invalid_answers_from_failed_rows(stub, tmp_path):
+    import pandas as pd
+
+    # Addresses without a knowledge-graph type, so every snippet goes to GPT.
+    addresses = [f"{i} Elm St" for i in range(40) if "knowledgeGraph" not in SerperStub._result(f"{i} Elm St")][:3]
+    addresses.insert(1, "7 broken Street")
+    input_path, output_path = tmp_path / "data.csv", tmp_path / "out.csv"
+    pd.DataFrame({"address": addresses}).to_csv(input_path, index=False)
+    agent = SerperAgent("stub", base_url=stub(_PickySerper), backoff_base=0.01)
+    gpt = GPT(api_key="stub", base_url=f"{stub(_OffListOpenAI)}/v1")
+
+    main.categorize_csv_streaming(str(input_path), str(output_path), concurrency=2, agent=agent, gpt=gpt)
+
+    out = pd.read_csv(output_path)
+    assert out["category"].isna().all()
+    assert not out["category_valid"].any()
+    assert out["category_raw"].isna().tolist() == [False, True, False, False]
+    assert (out["category_raw"].dropna() == "Space Elevator").all()
+
+
+def test_batched_run_stops_within_the_credit_budget(stub, gpt):
+    queries = [f"{i} Industrial Pkwy, {30000 + i}" for i in range(1000)]
+    agent = SerperAgent("stub", base_url=stub(SerperStub), pool_size=8, credit_budget=250)
+
+    results = main.categorize_batch(queries, concurrency=8, agent=agent, gpt=gpt, search_batch_size=100)
+
+    assert agent.budget.spent <= 250
+    assert any(result.get("stopped") for result in results)
+
+
+def test_batch_resolves_mapped_entity_types_without_gpt(agent, gpt):
+    queries = [f"{i} Elm St" for i in range(60)]
+
+    results = main.categorize_batch(queries, concurrency=8, agent=agent, gpt=gpt, dedupe=False)
+
+    for query, result in zip(queries, results):
+        entity_type = SerperStub._result(query).get("knowledgeGraph", {}).get("type")
+        expected = main.ENTITY_MAPPER.lookup(entity_type)
+        if expected:
+            assert (result["source"], result["category"]) == ("entity", expected)
+            assert "answer" not in result
+        else:
+            assert result["source"] == "llm"
+    assert any(result["source"] == "entity" for result in results)
+
+
+def test_offline_run_keeps_paid_searches_and_searches_failures_again(stub, tmp_path):
+    queries = [f"{i} {'broken' if i in (3, 120) else 'Main'} Street, {40000 + i}" for i in range(150)]
+    state_path = str(tmp_path / "batch.json")
+    gpt = GPT(api_key="stub", base_url=f"{stub(_QuickBatchOpenAI)}/v1")
+
+    # The first group of 50 is searched, then the budget cannot cover the second.
+    first = SerperAgent("stub", base_url=stub(_PickySerper), backoff_base=0.01, credit_budget=60)
+    with pytest.raises(BudgetExhausted):
+        main.categorize_offline(queries, state_path, agent=first, gpt=gpt, search_batch_size=50, poll_interval=0.05)
+
+    # The 100 unsearched addresses and the one failed search in the first group are searched again.
+    second = SerperAgent("stub", base_url=stub(SerperStub), credit_budget=1000)
+    results = main.categorize_offline(queries, state_path, agent=second, gpt=gpt, search_batch_size=50, poll_interval=0.05)
+
+    assert second.budget.spent == 101
+    assert all(result["error"] is None for result in results)
+    assert results[3]["snippet"] == _snippet(queries[3])
+
+
+def test_batch_stops_when_the_openai_quota_runs_out(stub):
+    # Addresses without a knowledge-graph type, so every snippet goes to GPT.
+    queries = [f"{i} Elm St" for i in range(80) if "knowledgeGraph" not in SerperStub._result(f"{i} Elm St")][:20]
+    agent = SerperAgent("stub", base_url=stub(SerperStub))
+    gpt = GPT(api_key="stub", base_url=f"{stub(_BrokeOpenAI)}/v1", backoff_base=0.01)
+
+    results = main.categorize_batch(queries, concurrency=2, agent=agent, gpt=gpt, dedupe=False)
+
+    assert all(result["category"] is None for result in results)
+    assert all(result.get("stopped") for result in results)
+    assert any("quota" in result["error"] for result in results)
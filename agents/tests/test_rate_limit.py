@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import pytest
+
+from rate_limit import BudgetExhausted, CreditBudget, TokenBucket
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    # 5 tokens are available at once; the other 10 arrive at 50 per second.
+    assert 0.18 <= elapsed < 0.5
+
+
+def test_token_bucket_async_paces_without_blocking_the_loop():
+    bucket = TokenBucket(rate=100, burst=1)
+
+    async def main():
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.aacquire() for _ in range(11)))
+        return time.monotonic() - start
+
+    assert 0.09 <= asyncio.run(main()) < 0.4
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_credit_budget_raises_once_spent():
+    budget = CreditBudget(limit=3)
+    budget.check()
+    budget.spend(2)
+    budget.check()
+    budget.spend(1)
+    assert budget.exhausted
+    with pytest.raises(BudgetExhausted):
+        budget.check()
+
+
+def test_credit_budget_reservations_never_pass_the_limit():
+    budget = CreditBudget(limit=250)
+    budget.reserve(100)
+    budget.reserve(100)
+    with pytest.raises(BudgetExhausted):
+        budget.reserve(100)
+    # A request that failed gives its credits back; one that cost less settles lower.
+    budget.settle(100, 0)
+    budget.settle(100, 90)
+    assert budget.spent == 90
+    budget.reserve(100)
+    assert budget.spent == 190
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import time
+
+import pytest
+
+from router import HedgedRouter
+
+_from_cache = contextvars.ContextVar("from_cache", default=False)
+
+
+class _Backend:
+    def __init__(self, name, delay, cached=False):
+        self.name = name
+        self.delay = delay
+        self.cached = cached
+        self.cancelled = 0
+
+    @property
+    def served_from_cache(self):
+        return _from_cache.get()
+
+    async def acall(self, system_prompt, user_prompt, **kwargs):
+        _from_cache.set(self.cached)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"{self.name}:{user_prompt}"
+
+
+def test_sync_call_cancels_the_losing_request():
+    slow, fast = _Backend("slow", 5.0), _Backend("fast", 0.01)
+    router = HedgedRouter([("slow", slow), ("fast", fast)], default_delay=0.02)
+    try:
+        assert router.call("system", "q") == "fast:q"
+        # The cancellation is delivered on the router's loop shortly after the answer.
+        deadline = time.monotonic() + 1
+        while not slow.cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert slow.cancelled == 1
+    finally:
+        router.close()
+
+
+def test_cache_hits_do_not_count_as_latency_samples():
+    router = HedgedRouter([("primary", _Backend("primary", 0.0, cached=True))])
+    try:
+        assert router.call("system", "q") == "primary:q"
+        assert len(router.latency["primary"]) == 0
+        router.backends[0][1].cached = False
+        router.call("system", "q")
+        assert len(router.latency["primary"]) == 1
+    finally:
+        router.close()
+
+
+def test_sync_call_raises_when_every_backend_raises():
+    class Failing:
+        async def acall(self, *args, **kwargs):
+            raise ValueError("boom")
+
+    router = HedgedRouter([("a", Failing()), ("b", Failing())], default_delay=0.01)
+    try:
+        with pytest.raises(ValueError):
+            router.call("system", "q")
+    finally:
+        router.close()
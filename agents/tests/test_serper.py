@@ -0,0 +1,90 @@
+from loadtest import SerperStub
+from serper import SerperAgent
+
+
+class _PartialSerper(SerperStub):
+    """
+    Serper stub for partial failures of multi-query requests.
+
+    Inside a batch, queries containing "flaky" come back as error entries.
+    Queries containing "broken" fail with a 400 when searched on their own,
+    and every batch fails with a 500 once fail_batches is set. Requests are
+    tallied in sent.
+    """
+
+    fail_batches = False
+    sent = None
+
+    def reply(self, payload):
+        if isinstance(payload, list):
+            self.sent["batches"] += 1
+            if self.fail_batches:
+                return self._send(500, {"message": "Stub server error"})
+            return self._send(200, [
+                {"statusCode": 500, "message": "Stub entry error"} if "flaky" in item["q"] else self._result(item["q"])
+                for item in payload
+            ])
+        self.sent["singles"] += 1
+        if "broken" in payload["q"]:
+            return self._send(400, {"message": "Bad query"})
+        super().reply(payload)
+
+
+def _agent(stub, fail_batches=False):
+    """SerperAgent on a fresh _PartialSerper; returns (agent, request tally)."""
+    sent = {"batches": 0, "singles": 0}
+    handler = type("Stub", (_PartialSerper,), {"fail_batches": fail_batches, "sent": sent})
+    return SerperAgent("stub", base_url=stub(handler), max_retries=1, backoff_base=0.01), sent
+
+
+def test_error_entries_are_searched_again_one_by_one(stub):
+    agent, sent = _agent(stub)
+    queries = ["1 Oak Ave", "2 flaky Ave", "3 Oak Ave", "4 flaky Ave", "5 Oak Ave"]
+
+    results = agent.search_batch(queries, batch_size=3, fields=("organic",))
+
+    assert [result.query for result in results] == queries
+    assert sent["batches"] == 2
+    assert sent["singles"] == 2
+
+
+def test_a_failed_group_falls_back_to_single_searches(stub):
+    agent, sent = _agent(stub, fail_batches=True)
+    queries = [f"{i} Oak Ave" for i in range(4)]
+
+    results = agent.search_batch(queries, batch_size=2, fields=("organic",))
+
+    assert [result.query for result in results] == queries
+    assert sent["singles"] == 4
+
+
+def test_queries_that_still_fail_come_back_as_none(stub):
+    agent, sent = _agent(stub, fail_batches=True)
+    queries = ["1 Oak Ave", "2 broken Ave", "3 Oak Ave"]
+
+    results = agent.search_batch(queries, batch_size=3, fields=("organic",))
+
+    assert results[1] is None
+    assert [result.query for result in (results[0], results[2])] == ["1 Oak Ave", "3 Oak Ave"]
+
+
+def test_batches_in_flight_stay_within_the_credit_budget(stub):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import pytest
+
+    from rate_limit import BudgetExhausted
+
+    agent = SerperAgent("stub", base_url=stub(SerperStub, median_ms=50.0), pool_size=8, credit_budget=250)
+    groups = [[f"{g}-{i} Oak Ave" for i in range(100)] for g in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(agent.search_batch, group, batch_size=100) for group in groups]
+    finished = [future for future in futures if future.exception() is None]
+    for future in futures:
+        if future.exception() is not None:
+            with pytest.raises(BudgetExhausted):
+                future.result()
+
+    assert len(finished) == 2
+    assert agent.budget.spent == 200
@@ -0,0 +1,44 @@
+import pytest
+
+from taxonomy import EntityTypeMapper
+
+NAMES = ["Elementary School", "Marine Terminal", "Fuel Station", "Restaurant", "Bar", "Office Building"]
+TYPE_MAP = {"container terminal": "Marine Terminal", "gas station": "Fuel Station"}
+
+
+@pytest.fixture
+def mapper():
+    return EntityTypeMapper(NAMES, TYPE_MAP, ambiguous={"Bar"})
+
+
+def test_types_naming_a_category_or_listed_in_the_map_resolve(mapper):
+    assert mapper.lookup("Elementary school") == "Elementary School"
+    assert mapper.lookup("Elementary Schools") == "Elementary School"
+    assert mapper.lookup("Container terminal") == "Marine Terminal"
+    assert mapper.lookup("Pizza restaurant") is None
+    assert mapper.lookup(None) is None
+
+
+def test_ambiguous_names_are_not_assigned_from_a_type_alone(mapper):
+    assert mapper.lookup("Bar") is None
+
+
+def test_knowledge_graph_type_wins_over_places(mapper):
+    assert mapper.match("Gas station", ("Restaurant", "Restaurant")) == "Fuel Station"
+
+
+def test_places_are_used_only_when_every_mapped_type_agrees(mapper):
+    assert mapper.match(None, ("Restaurant", "Pizza restaurant", "Restaurant")) == "Restaurant"
+    assert mapper.match(None, ("Restaurant", "Gas station")) is None
+    assert mapper.match(None, ()) is None
+
+
+def test_hit_rate_counts_every_match(mapper):
+    mapper.match("Gas station")
+    mapper.match("Pizza restaurant")
+    assert (mapper.lookups, mapper.hits, mapper.hit_rate) == (2, 1, 0.5)
+
+
+def test_type_map_must_point_at_known_categories():
+    with pytest.raises(ValueError):
+        EntityTypeMapper(NAMES, {"car wash": "Car Wash"})
@@ -0,0 +1,34 @@
+import pytest
+
+import tokens
+from metrics import registry
+from open_ai import GPT, GPTRequestError
+
+
+@pytest.fixture
+def without_tiktoken(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", lambda model: None)
+    tokens._message_tokens.cache_clear()
+    yield
+    tokens._message_tokens.cache_clear()
+
+
+def test_message_count_includes_the_chat_framing(without_tiktoken):
+    messages = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 9}]
+    # 10 + 3 tokens of content, 3 per message and 3 for the reply.
+    assert tokens.count_message_tokens(messages) == 10 + 3 + 2 * tokens.TOKENS_PER_MESSAGE + tokens.TOKENS_PER_REPLY
+
+
+def test_prompt_tokens_are_counted_on_the_row_before_sending(gpt):
+    with registry.row(query="q") as row:
+        assert gpt.call(system_prompt="Classify.", user_prompt="Shell gas station", temperature=0)
+    expected = tokens.count_message_tokens([{"content": "Classify."}, {"content": "Shell gas station"}])
+    assert row["counters"]["llm_prompt_tokens_estimated"] == expected
+
+
+def test_prompt_over_the_limit_is_refused_without_a_request():
+    # Nothing listens on this port, so a sent request would fail with a connection error.
+    gpt = GPT(api_key="stub", base_url="http://127.0.0.1:1/v1", max_prompt_tokens=50, max_retries=0)
+
+    with pytest.raises(GPTRequestError, match="over the 50 token limit"):
+        gpt.call(system_prompt="Classify.", user_prompt="word " * 400)
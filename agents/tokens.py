@@ -0,0 +1,84 @@
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Rough characters per token for English text, used when tiktoken is missing.
+CHARS_PER_TOKEN = 4
+
+# Chat formatting overhead: tokens wrapped around every message and the reply.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken is not installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count the tokens of a text locally.
+
+    Uses tiktoken when it is installed and a characters-per-token estimate
+    otherwise.
+
+    Args:
+        text: Text to count
+        model: Model whose tokenizer applies
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=4096)
+def _message_tokens(content: str, model: str) -> int:
+    # Requests repeat the same system prompt, so its count is reused.
+    return TOKENS_PER_MESSAGE + count_tokens(content, model)
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4o") -> int:
+    """
+    Estimate the prompt tokens of a chat request, including message framing.
+
+    Args:
+        messages: Chat messages with "content" strings
+        model: Model whose tokenizer applies
+
+    Returns:
+        Number of prompt tokens
+    """
+    return sum(_message_tokens(message["content"], model) for message in messages) + TOKENS_PER_REPLY
+
+
+def trim_to_tokens(text: str, budget: Optional[int], model: str = "gpt-4o") -> str:
+    """
+    Cut a text down to at most budget tokens, keeping its beginning.
+
+    Args:
+        text: Text to trim
+        budget: Maximum number of tokens (None to keep the text whole)
+        model: Model whose tokenizer applies
+
+    Returns:
+        The text, shortened if it was over budget
+    """
+    if budget is None:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:budget * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
@@ -1,16 +1,23 @@
 import os
-from twilio.rest import Client
 
-# Find your Account SID and Auth Token at twilio.com/console
-# and set the environment variables. See http://twil.io/secure
-account_sid = "ACc8ad97ead8fc2fcb8b3b26c89a852987"
-auth_token ="3497161596edf43575164f4b53a79444"
-client = Client(account_sid, auth_token)
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from twilio.rest import Client
 
-message = client.messages.create(
-    from_="whatsapp:+16509005017",
-    body="Hello, there!",
-    to="whatsapp:+15109895404",
-)
+    load_dotenv()
 
-print(message.body)
\ No newline at end of file
+    # Find your Account SID and Auth Token at twilio.com/console
+    # and set the environment variables. See http://twil.io/secure
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+    if not account_sid or not auth_token:
+        raise ValueError("TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN must be set in environment variables.")
+    client = Client(account_sid, auth_token)
+
+    message = client.messages.create(
+        from_="whatsapp:+16509005017",
+        body="Hello, there!",
+        to="whatsapp:+15109895404",
+    )
+
+    print(message.body)